@@ -0,0 +1,170 @@
+"""
+Local semantic cache for repeated, self-contained chatbot questions.
+
+Questions are embedded with a stateless character n-gram HashingVectorizer
+(CPU only, nothing to fit or download) and compared by cosine similarity
+against every cached question in one sparse matrix product. A cached
+answer is reused when the best match clears the threshold and both
+questions agree on the numbers, the model variant words ("pro", "max",
+"ultra"...) and the negations they contain. Those are the differences a
+character-level similarity score barely notices. Questions about
+differently named phones are only kept apart by the score itself.
+
+Only stand-alone questions are cached: turns that refer back to the
+conversation ("is it waterproof?", "what about the previous one") depend
+on history and always go to the LLM. Answers are shared by every user, so
+chatbot.py only stores those generated from a prompt without any
+conversation history or summary.
+"""
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+
+import metrics
+from RecommendationEngine.phone_catalog import VARIANT_WORDS
+
+CHAT_ANSWER_CACHE = os.getenv("CHAT_ANSWER_CACHE", "1") == "1"
+CHAT_ANSWER_CACHE_SIZE = int(os.getenv("CHAT_ANSWER_CACHE_SIZE", "2000"))
+CHAT_ANSWER_CACHE_TTL_SECONDS = int(os.getenv("CHAT_ANSWER_CACHE_TTL_SECONDS", "86400"))
+CHAT_ANSWER_CACHE_THRESHOLD = float(os.getenv("CHAT_ANSWER_CACHE_THRESHOLD", "0.85"))
+
+# Longer messages are rarely repeated and usually carry personal details
+MAX_CACHEABLE_WORDS = 30
+
+CONTEXT_REFERENCE = re.compile(
+    r"\b(it|its|it's|this|that|these|those|they|them|one|ones|above|previous|earlier|"
+    r"same|again|also|instead|you said|what about|how about)\b"
+)
+NUMBER = re.compile(r"\d+(?:\.\d+)?")
+NEGATIONS = {
+    "not", "no", "never", "without", "cannot", "nor", "neither",
+    "cant", "dont", "doesnt", "isnt", "arent", "wont", "didnt", "wasnt", "hasnt", "havent",
+}
+
+lookups_total = metrics.counter(
+    "chat_answer_cache_lookups_total", "Semantic answer cache lookups by result (hit, miss, skip)")
+
+
+def normalize_question(message: str) -> str:
+    # "isn't" -> "is not", "s23+" -> "s23 plus", so negations and variants are whole words
+    text = message.lower().replace("n't", " not").replace("n’t", " not").replace("+", " plus ")
+    return " ".join(re.sub(r"[^\w\s]", " ", text).split())
+
+
+def question_signature(text: str) -> tuple:
+    """What two similar questions must share for one's answer to serve the other."""
+    words = set(text.split())
+    return frozenset(NUMBER.findall(text)), frozenset(words & VARIANT_WORDS), frozenset(words & NEGATIONS)
+
+
+def is_cacheable(message: str) -> bool:
+    """True for short questions that make sense without the conversation."""
+    text = normalize_question(message)
+    return 0 < len(text.split()) <= MAX_CACHEABLE_WORDS and not CONTEXT_REFERENCE.search(text)
+
+
+class SemanticAnswerCache:
+    def __init__(self, maxsize: int = 2000, ttl: float = None, threshold: float = 0.85, n_features: int = 2 ** 18):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.threshold = threshold
+        self.n_features = n_features
+        self._vectorizer = None         # created on first use; sklearn is slow to import
+        self._entries = OrderedDict()   # normalized question -> (vector, signature, answer, expires_at)
+        self._index = None              # (keys, stacked vectors), rebuilt lazily after changes
+        self._lock = threading.Lock()
+
+    @property
+    def vectorizer(self):
+        if self._vectorizer is None:
+            from sklearn.feature_extraction.text import HashingVectorizer
+
+            self._vectorizer = HashingVectorizer(
+                analyzer="char_wb", ngram_range=(3, 5), n_features=self.n_features, alternate_sign=False, norm="l2"
+            )
+        return self._vectorizer
+
+    def _embed(self, text: str):
+        return self.vectorizer.transform([text])
+
+    def _build_index(self):
+        if self._index is None:
+            import scipy.sparse as sp
+
+            keys = list(self._entries)
+            matrix = sp.vstack([self._entries[k][0] for k in keys]).tocsr() if keys else None
+            self._index = (keys, matrix)
+        return self._index
+
+    def lookup(self, message: str):
+        """Cached answer for a similar question, or None."""
+        text = normalize_question(message)
+        vector = self._embed(text)
+        signature = question_signature(text)
+
+        with self._lock:
+            keys, matrix = self._build_index()
+            if matrix is None:
+                return None
+
+            scores = (matrix @ vector.T).toarray().ravel()
+            # Best candidate that also agrees on numbers, variants and negations
+            for row in scores.argsort()[::-1]:
+                if scores[row] < self.threshold:
+                    return None
+                key = keys[row]
+                _, entry_signature, answer, expires_at = self._entries[key]
+                if expires_at is not None and expires_at < time.monotonic():
+                    continue
+                if entry_signature == signature:
+                    self._entries.move_to_end(key)
+                    return answer
+        return None
+
+    def store(self, message: str, answer: str):
+        text = normalize_question(message)
+        expires_at = time.monotonic() + self.ttl if self.ttl else None
+        entry = (self._embed(text), question_signature(text), answer, expires_at)
+
+        with self._lock:
+            self._entries[text] = entry
+            self._entries.move_to_end(text)
+            now = time.monotonic()
+            for key in [k for k, e in self._entries.items() if e[3] is not None and e[3] < now]:
+                del self._entries[key]
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+            self._index = None
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._index = None
+
+    def __len__(self):
+        return len(self._entries)
+
+
+answer_cache = SemanticAnswerCache(
+    maxsize=CHAT_ANSWER_CACHE_SIZE,
+    ttl=CHAT_ANSWER_CACHE_TTL_SECONDS,
+    threshold=CHAT_ANSWER_CACHE_THRESHOLD,
+)
+
+
+def cached_answer(message: str):
+    """Look up a stand-alone question; records hit/miss/skip."""
+    if not CHAT_ANSWER_CACHE or not is_cacheable(message):
+        lookups_total.inc(result="skip")
+        return None
+
+    answer = answer_cache.lookup(message)
+    lookups_total.inc(result="hit" if answer is not None else "miss")
+    return answer
+
+
+def remember_answer(message: str, answer: str):
+    if CHAT_ANSWER_CACHE and answer and is_cacheable(message):
+        answer_cache.store(message, answer)
@@ -1,9 +1,11 @@
-from langchain_google_genai import ChatGoogleGenerativeAI
+import asyncio
 import os
-from langchain_core.messages import HumanMessage, AIMessage, SystemMessage
 import re
-from RecommendationEngine.recommendation_service import get_recommendations
-from RecommendationEngine import recommendation_service
+from langchain_core.messages import HumanMessage, AIMessage, SystemMessage
+import llm
+from ChatBot.answer_cache import cached_answer, remember_answer
+from ChatBot.intent_router import route
+from RecommendationEngine.recommendation_service import get_recommendations, catalog, format_price
 
 SYSTEM_PROMPT = """
 You are a mobile phone expert assistant.
@@ -32,78 +34,135 @@ Avoid emojis; keep the tone professional and informative.
 Keep explanations concise and structured in short paragraphs.
 """
 
+# Rough prompt budget for history; older turns are covered by the conversation summary
+CHAT_PROMPT_TOKEN_BUDGET = int(os.getenv("CHAT_PROMPT_TOKEN_BUDGET", "3000"))
+
+
+def estimate_tokens(text: str) -> int:
+    # ~4 characters per token is close enough for budgeting
+    return len(text) // 4 + 1
+
 def extract_budget_and_priority(message: str):
     """
     Extract budget (number) and priority from user message.
     Defaults are applied if missing.
     """
+    result = route(message)
+    return result.max_price, result.priority
 
-    # Extract budget (e.g. 70000, 70k, 70,000)
-    budget_match = re.search(r'(\d{2,6})', message.replace(",", ""))
-    max_price = float(budget_match.group(1)) if budget_match else 70000
-
-    # Priority keywords
-    priorities = {
-        "gaming": ["gaming", "performance", "fps"],
-        "camera": ["camera", "photography", "selfie"],
-        "battery": ["battery", "backup", "mah"],
-        "general": ["all round", "balanced", "daily use"]
-    }
-
-    priority = "general"
-
-    for key, words in priorities.items():
-        if any(word in message.lower() for word in words):
-            priority = key
-            break
+def is_recommendation_query(message: str) -> bool:
+    return route(message).intent == "recommend"
 
-    return max_price, priority
 
-def is_recommendation_query(message: str) -> bool:
-    keywords = [
-        "recommend",
-        "recommendation",
-        "suggest",
-        "suggestion",
-        "best phone",
-        "which phone",
-        "buy",
-        "purchase"
-    ]
-
-    message = message.lower()
-    return any(keyword in message for keyword in keywords)
-
-
-
-def generate_reply(chat_history, user_message):
-    # 🔀 Step 1: check if recommendation intent
-    if is_recommendation_query(user_message):
-        max_price, priority = extract_budget_and_priority(user_message)
-
-        rec_response = get_recommendations(
-            max_price=max_price,
-            priority=priority
-        )
-
-        return rec_response["recommendations"]
-
-    llm = ChatGoogleGenerativeAI(
-        model="gemini-2.5-flash",
-        temperature=0.3,
-        google_api_key=os.getenv("GOOGLE_API_KEY")
-    )
 
+def build_messages(chat_history, user_message, summary=None):
     messages = [SystemMessage(content=SYSTEM_PROMPT)]
+    if summary:
+        messages.append(SystemMessage(content=f"Summary of the earlier conversation:\n{summary}"))
+
+    # Keep the most recent history that fits the budget
+    budget = CHAT_PROMPT_TOKEN_BUDGET - estimate_tokens(user_message) - estimate_tokens(summary or "")
+    recent = []
+    for msg in reversed(chat_history):
+        budget -= estimate_tokens(msg["content"])
+        if budget < 0:
+            break
+        recent.append(msg)
 
-    for msg in chat_history:
+    for msg in reversed(recent):
         if msg["role"] == "user":
             messages.append(HumanMessage(content=msg["content"]))
         else:
             messages.append(AIMessage(content=msg["content"]))
 
     messages.append(HumanMessage(content=user_message))
+    return messages
+
+
+async def recommendation_reply(user_message, intent=None):
+    intent = intent or route(user_message)
+
+    # Catalog lookups and the cache are blocking; keep them off the event loop
+    rec_response = await asyncio.to_thread(
+        get_recommendations,
+        max_price=intent.max_price,
+        priority=intent.priority
+    )
 
-    response = llm.invoke(messages)
-    return response.content
+    return rec_response["recommendations"]
 
+
+# Words a plain price question may carry besides the phone name ("price of pixel 8 in pakistan")
+PRICE_FILLER = {"the", "a", "an", "in", "pakistan", "pk", "today", "now", "currently", "new", "latest",
+                "price", "official", "hai", "ka", "ki", "variant", "model", "phone", "mobile"}
+_CONFIGURATION = re.compile(r"\d+(?:gb|tb)|\d+/\d+(?:gb)?")
+
+
+def price_check_reply(user_message, subject=None):
+    """
+    New-phone price straight from the catalog, or None to let the LLM answer:
+    when no catalog phone is named, or the subject asks about more than the phone.
+    """
+    subject = subject or user_message
+    phone = catalog.snapshot.find_by_name(subject)
+    if phone is None:
+        return None
+
+    leftover = set(re.sub(r"[^a-z0-9+/]+", " ", subject.lower()).split())
+    leftover -= set(re.sub(r"[^a-z0-9+/]+", " ", phone["phone_name"].lower()).split())
+    if any(word not in PRICE_FILLER and not _CONFIGURATION.fullmatch(word) for word in leftover):
+        return None
+
+    reply = f"The **{phone['phone_name']}** is currently listed at **{format_price(phone.get('price_range'))}**."
+    if phone.get("description"):
+        reply += f"\n\n{phone['description']}"
+    return reply
+
+
+async def local_reply(user_message):
+    """Answer from the intent router without the LLM, or None to fall through to it."""
+    intent = route(user_message)
+
+    if intent.intent == "recommend":
+        return await recommendation_reply(user_message, intent)
+    if intent.intent == "price_check":
+        return await asyncio.to_thread(price_check_reply, user_message, intent.subject)
+    return None
+
+
+async def generate_reply(chat_history, user_message, summary=None):
+    # 🔀 Step 1: intents answered locally (recommendations, catalog prices)
+    local = await local_reply(user_message)
+    if local is not None:
+        return local
+
+    # Embedding and scoring are CPU work; keep them off the event loop
+    cached = await asyncio.to_thread(cached_answer, user_message)
+    if cached is not None:
+        return cached
+
+    reply = await llm.agenerate(build_messages(chat_history, user_message, summary))
+    if not chat_history and not summary:
+        # Answers are shared across users; only those from a history-free prompt are stored
+        await asyncio.to_thread(remember_answer, user_message, reply)
+    return reply
+
+
+async def stream_reply(chat_history, user_message, summary=None):
+    """Like generate_reply, but yields the reply in chunks as it is generated."""
+    local = await local_reply(user_message)
+    if local is not None:
+        yield local
+        return
+
+    cached = await asyncio.to_thread(cached_answer, user_message)
+    if cached is not None:
+        yield cached
+        return
+
+    parts = []
+    async for chunk in llm.astream(build_messages(chat_history, user_message, summary)):
+        parts.append(chunk)
+        yield chunk
+    if not chat_history and not summary:
+        await asyncio.to_thread(remember_answer, user_message, "".join(parts))
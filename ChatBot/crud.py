@@ -1,56 +1,259 @@
 from bson import ObjectId
-from datetime import datetime
+from collections import deque
+from datetime import datetime, timedelta
+import os
+from pymongo import ASCENDING, DESCENDING
+from pymongo.errors import PyMongoError
+from cache import TTLCache
 from ChatBot.db import conversations_col, messages_col
+from ChatBot.write_buffer import TurnWriteBuffer
 from models import ChatHistoryResponse, ChatMessage
+from logs import get_logger
+import metrics
 from typing import List
 
-def create_conversation(user_id, first_message):
+logger = get_logger(__name__)
+
+# Optional write-behind persistence of chat turns (flushed in batches, drained on shutdown)
+CHAT_WRITE_BEHIND = os.getenv("CHAT_WRITE_BEHIND", "0") == "1"
+write_buffer = TurnWriteBuffer(
+    messages_col,
+    conversations_col,
+    flush_interval=float(os.getenv("CHAT_WRITE_BEHIND_INTERVAL_SECONDS", "0.5")),
+) if CHAT_WRITE_BEHIND else None
+
+# Recent messages of active conversations, kept current by save_turn (write-through)
+HISTORY_CACHE_MESSAGES = 20
+history_cache = TTLCache(
+    maxsize=int(os.getenv("CHAT_HISTORY_CACHE_SIZE", "5000")),
+    ttl=int(os.getenv("CHAT_HISTORY_CACHE_TTL_SECONDS", "1800")),
+)
+
+# Rolling conversation summaries (see ChatBot/summarizer.py), write-through like history_cache
+summary_cache = TTLCache(
+    maxsize=int(os.getenv("CHAT_HISTORY_CACHE_SIZE", "5000")),
+    ttl=int(os.getenv("CHAT_HISTORY_CACHE_TTL_SECONDS", "1800")),
+)
+metrics.register_cache("chat_history", history_cache)
+metrics.register_cache("chat_summaries", summary_cache)
+
+async def ensure_indexes():
+    # Serves the history window, keyset pages and the export, all ordered by (created_at, _id),
+    # without an in-memory sort
+    try:
+        await messages_col.create_index(
+            [("conversation_id", ASCENDING), ("created_at", ASCENDING), ("_id", ASCENDING)]
+        )
+    except PyMongoError as e:
+        logger.warning("Could not create chat indexes", extra={"error": str(e)})
+
+async def create_conversation(user_id, first_message):
     doc = {
         "user_id": user_id,
         "title": first_message[:40],
         "created_at": datetime.utcnow(),
         "updated_at": datetime.utcnow()
     }
-    result = conversations_col.insert_one(doc)
-    return str(result.inserted_id)
+    result = await conversations_col.insert_one(doc)
+    conversation_id = str(result.inserted_id)
+
+    # A new conversation has no history yet; later turns are appended as they are saved
+    history_cache.set(conversation_id, deque(maxlen=HISTORY_CACHE_MESSAGES))
+    summary_cache.set(conversation_id, {"summary": None, "summarized_until": None})
+    return conversation_id
+
+async def get_conversation_summary(conversation_id) -> dict:
+    """{"summary", "summarized_until"} stored on the conversation document."""
+    cached = summary_cache.get(conversation_id)
+    if cached is not None:
+        return cached
+
+    doc = await conversations_col.find_one(
+        {"_id": ObjectId(conversation_id)},
+        {"summary": 1, "summarized_until": 1}
+    ) or {}
+    state = {"summary": doc.get("summary"), "summarized_until": doc.get("summarized_until")}
+    summary_cache.set(conversation_id, state)
+    return state
+
+async def save_conversation_summary(conversation_id, summary, summarized_until):
+    await conversations_col.update_one(
+        {"_id": ObjectId(conversation_id)},
+        {"$set": {"summary": summary, "summarized_until": summarized_until}}
+    )
+    summary_cache.set(conversation_id, {"summary": summary, "summarized_until": summarized_until})
+
+async def get_messages_after(conversation_id, after=None):
+    """Messages created after `after` (all when None), oldest first."""
+    query = {"conversation_id": ObjectId(conversation_id)}
+    if after is not None:
+        query["created_at"] = {"$gt": after}
 
-def get_chat_history(conversation_id, limit=10):
     msgs = messages_col.find(
-        {"conversation_id": ObjectId(conversation_id)}
-    ).sort("created_at", 1).limit(limit)
+        query, {"_id": 0, "role": 1, "content": 1, "created_at": 1}
+    ).sort("created_at", ASCENDING)
+    return [m async for m in msgs]
 
-    return [
-        {"role": m["role"], "content": m["content"]}
-        for m in msgs
-    ]
+async def get_chat_history(conversation_id, limit=10):
+    """The most recent `limit` messages of a conversation, oldest first."""
+    if limit <= HISTORY_CACHE_MESSAGES:
+        cached = history_cache.get(conversation_id)
+        if cached is not None:
+            return list(cached)[-limit:]
+
+    depth = max(limit, HISTORY_CACHE_MESSAGES)
+    msgs = messages_col.find(
+        {"conversation_id": ObjectId(conversation_id)},
+        {"role": 1, "content": 1}
+    ).sort("created_at", DESCENDING).limit(depth)
+
+    docs = [m async for m in msgs]
+    docs.reverse()
+    history = [{"role": m["role"], "content": m["content"]} for m in docs]
 
-def save_message(conversation_id, user_id, role, content):
-    messages_col.insert_one({
+    # Turns still waiting in (or being flushed from) the write-behind buffer are part of the history
+    # too; a flush may land between the query and this point, so skip messages already read
+    if write_buffer is not None:
+        saved = {m["_id"] for m in docs}
+        history += [
+            {"role": m["role"], "content": m["content"]}
+            for m in write_buffer.pending(ObjectId(conversation_id))
+            if m["_id"] not in saved
+        ]
+
+    history_cache.set(conversation_id, deque(history, maxlen=HISTORY_CACHE_MESSAGES))
+    return history[-limit:]
+
+def _cache_messages(conversation_id, messages):
+    cached = history_cache.get(conversation_id)
+    if cached is not None:
+        cached.extend({"role": m["role"], "content": m["content"]} for m in messages)
+
+async def save_message(conversation_id, user_id, role, content):
+    await messages_col.insert_one({
         "conversation_id": ObjectId(conversation_id),
         "user_id": user_id,
         "role": role,
         "content": content,
         "created_at": datetime.utcnow()
     })
+    _cache_messages(conversation_id, [{"role": role, "content": content}])
 
-    conversations_col.update_one(
+    await conversations_col.update_one(
         {"_id": ObjectId(conversation_id)},
         {"$set": {"updated_at": datetime.utcnow()}}
     )
-def get_chat_history_formatted(conversation_id: str) -> ChatHistoryResponse:
-    """Fetch messages from MongoDB and return in frontend-friendly format."""
-    # Fetch all messages for the conversation
-    messages_cursor = messages_col.find({"conversation_id": ObjectId(conversation_id)}).sort("created_at", 1)
-    
-    messages: List[ChatMessage] = []
-    
-    for msg in messages_cursor:
-        messages.append(ChatMessage(
+
+def _message_doc(conversation_id, user_id, role, content, created_at):
+    return {
+        "_id": ObjectId(),      # assigned up front so a buffered message is recognized once saved
+        "conversation_id": ObjectId(conversation_id),
+        "user_id": user_id,
+        "role": role,
+        "content": content,
+        "created_at": created_at
+    }
+
+async def save_turn(conversation_id, user_id, user_message, reply, user_at=None):
+    """
+    Persist one chat turn (user message + assistant reply) with a single
+    insert_many and a single conversation update, or queue it in the
+    write-behind buffer when CHAT_WRITE_BEHIND is enabled.
+    """
+    now = datetime.utcnow()
+    user_at = user_at or now
+    # Mongo keeps millisecond precision; the reply must sort after the question
+    reply_at = max(now, user_at + timedelta(milliseconds=1))
+    messages = [
+        _message_doc(conversation_id, user_id, "user", user_message, user_at),
+        _message_doc(conversation_id, user_id, "assistant", reply, reply_at),
+    ]
+
+    if write_buffer is not None:
+        write_buffer.add(messages)
+    else:
+        await messages_col.insert_many(messages, ordered=True)
+        await conversations_col.update_one(
+            {"_id": ObjectId(conversation_id)},
+            {"$set": {"updated_at": reply_at}}
+        )
+
+    _cache_messages(conversation_id, messages)
+
+def _page_filter(conversation_id, anchor, direction):
+    """Messages strictly before/after anchor in (created_at, _id) order."""
+    op = "$lt" if direction == "before" else "$gt"
+    return {
+        "conversation_id": ObjectId(conversation_id),
+        "$or": [
+            {"created_at": {op: anchor["created_at"]}},
+            {"created_at": anchor["created_at"], "_id": {op: anchor["_id"]}},
+        ]
+    }
+
+async def get_chat_history_formatted(conversation_id: str, before: str = None, after: str = None,
+                                     limit: int = 50) -> ChatHistoryResponse:
+    """
+    Fetch one page of messages and return it in frontend-friendly format.
+    Without a cursor this is the latest page; `before`/`after` take a message
+    id and page towards older/newer messages. next_cursor continues in the
+    same direction while has_more is true.
+    """
+    direction = "after" if after else "before"
+    query = {"conversation_id": ObjectId(conversation_id)}
+
+    cursor_id = after or before
+    if cursor_id:
+        if not ObjectId.is_valid(cursor_id):
+            raise ValueError(f"Invalid message id: {cursor_id}")
+        anchor = await messages_col.find_one(
+            {"_id": ObjectId(cursor_id), "conversation_id": ObjectId(conversation_id)},
+            {"created_at": 1}
+        )
+        if anchor is None:
+            raise ValueError(f"Unknown message id: {cursor_id}")
+        query = _page_filter(conversation_id, anchor, direction)
+
+    order = ASCENDING if direction == "after" else DESCENDING
+    messages_cursor = messages_col.find(
+        query, {"role": 1, "content": 1, "created_at": 1}
+    ).sort([("created_at", order), ("_id", order)]).limit(limit + 1)
+
+    docs = [msg async for msg in messages_cursor]
+    has_more = len(docs) > limit
+    docs = docs[:limit]
+    next_cursor = str(docs[-1]["_id"]) if has_more else None
+
+    if direction == "before":
+        docs.reverse()
+
+    messages: List[ChatMessage] = [
+        ChatMessage(
+            id=str(msg["_id"]),
             role=msg["role"],
             content=msg["content"]
-        ))
-    
+        )
+        for msg in docs
+    ]
+
     return ChatHistoryResponse(
         conversation_id=conversation_id,
-        messages=messages
-    )
\ No newline at end of file
+        messages=messages,
+        has_more=has_more,
+        next_cursor=next_cursor
+    )
+
+async def iter_chat_messages(conversation_id: str, batch_size: int = 200):
+    """Yield every message of a conversation, oldest first, one batch in memory at a time."""
+    messages_cursor = messages_col.find(
+        {"conversation_id": ObjectId(conversation_id)},
+        {"role": 1, "content": 1, "created_at": 1}
+    ).sort([("created_at", ASCENDING), ("_id", ASCENDING)]).batch_size(batch_size)
+
+    async for msg in messages_cursor:
+        yield {
+            "id": str(msg["_id"]),
+            "role": msg["role"],
+            "content": msg["content"],
+            "created_at": msg["created_at"].isoformat()
+        }
@@ -1,13 +1,5 @@
-from pymongo import MongoClient
-import os
-from dotenv import load_dotenv
+import mongo
 
-load_dotenv()
-
-MONGO_URI = os.getenv("MONGO_CONNECTION_STRING")
-
-client = MongoClient(MONGO_URI)
-db = client["MobileDB"]
-
-conversations_col = db["conversations"]
-messages_col = db["messages"]
+# Chat runs on the shared async client; pool size and timeouts are the CHAT_DB_* settings in mongo.py
+conversations_col = mongo.async_collection("conversations")
+messages_col = mongo.async_collection("messages")
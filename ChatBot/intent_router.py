@@ -0,0 +1,200 @@
+"""
+Compiled intent router for chat messages.
+
+Every intent keyword, priority keyword and budget amount is folded into one
+compiled regex, so a message is lowercased once and scanned in a single
+finditer pass. The result carries the matched intents, the budget and the
+priority; route() picks the first intent (in INTENTS order) that matched.
+
+Budgets understand "70k", "70,000", "Rs 70000", "1.5 lac"/"lakh", and prefer
+amounts with a unit, currency or cue word ("under", "budget"...). Bare
+numbers only count as a budget from MIN_BARE_BUDGET up, so the "13" in
+"iPhone 13 under 70k" or "5000mAh" are not mistaken for one.
+
+price_check keywords only nominate the intent: it is kept when the message
+is price phrasing around a bare subject ("how much is <phone>", "price of
+<phone>", "<phone> kitne ka hai"), and the subject names no spec, part or
+service ("how much RAM does...", "cost of repairing ..."). The subject is
+returned in Route.subject for the catalog lookup.
+
+To add an intent, append an Intent to INTENTS. Intents without a local
+handler in chatbot.py are still detected, then answered by the LLM.
+
+Labelled examples live in intent_corpus.jsonl next to this file;
+    python -m ChatBot.intent_router
+checks the router against them and runs a microbenchmark.
+"""
+import re
+from dataclasses import dataclass, field
+from typing import Optional
+
+from RecommendationEngine.phone_ranker import PRIORITY_KEYWORDS
+
+DEFAULT_BUDGET = 70000
+DEFAULT_PRIORITY = "general"
+MIN_BARE_BUDGET = 1000
+
+UNIT_MULTIPLIERS = {"k": 1_000, "lac": 100_000, "lacs": 100_000, "lakh": 100_000, "lakhs": 100_000}
+
+
+@dataclass(frozen=True)
+class Intent:
+    name: str
+    keywords: tuple
+
+
+# Order matters: the first matching intent wins
+INTENTS = [
+    Intent("recommend", (
+        "recommend", "suggest", "best phone", "which phone", "buy", "purchase",
+    )),
+    Intent("resale", (
+        "sell", "resale", "used", "second hand", "secondhand", "worth", "trade in",
+    )),
+    Intent("price_check", (
+        "price of", "price for", "cost of", "how much", "what is the price", "what's the price",
+        "rate of", "kitne ka", "kitni price",
+    )),
+    Intent("damage", (
+        "crack", "broken", "shattered", "damage", "scratch", "dent", "dead pixel",
+        "green line", "panel line", "screen line", "spot on screen", "water damage",
+    )),
+]
+
+AMOUNT = (
+    r"(?P<cue>\b(?:under|below|within|upto|up to|max|maximum|less than|around|about|budget(?: is| of)?)\s*)?"
+    r"(?P<currency>\b(?:rs\.?|pkr)\s*)?"
+    r"(?<![\d.,])(?P<number>\d[\d,]*(?:\.\d+)?)(?![\d.,]*\d)"
+    r"\s*(?P<unit>k|lacs?|lakhs?)?\b"
+    r"(?!\s*(?:mah|gb|tb|mp|hz|w|mm|inch|inches|pro|plus|ultra|mini)\b)"
+)
+
+
+def _keyword_table():
+    table = {}
+    for intent in INTENTS:
+        for keyword in intent.keywords:
+            table.setdefault(keyword, ("intent", intent.name))
+    for priority, keywords in PRIORITY_KEYWORDS.items():
+        for keyword in keywords:
+            table.setdefault(keyword, ("priority", priority))
+    return table
+
+
+KEYWORDS = _keyword_table()
+
+# Keywords may not start mid-word but may end mid-word ("buying", "5000mah")
+_PATTERN = re.compile(
+    AMOUNT + "|(?<![a-z])(?P<keyword>" + "|".join(
+        re.escape(keyword) for keyword in sorted(KEYWORDS, key=len, reverse=True)
+    ) + ")"
+)
+
+_PRIORITY_ORDER = list(PRIORITY_KEYWORDS)
+
+# Price phrasing; the named group is what the price is asked for
+_PRICE_PHRASES = re.compile(
+    r"(?:^|\b(?:what(?:'s| is) the|tell me the|current|new|latest|the) )(?:price|cost|rate) (?:of|for) (?P<of>.+)$"
+    r"|^how much (?:is|are|for|does|do) (?P<how_much>.+?)(?: (?:cost|costs|go for|sell for))?$"
+    r"|^(?P<kitne>.+?) (?:(?:ki|ka) )?(?:kitne ka|kitne ki|kitni price|kitnay ka)(?: hai| he)?$"
+)
+
+# Anything asked about besides the phone itself: specs, parts and services
+NON_PHONE_WORDS = {
+    "ram", "storage", "memory", "battery", "camera", "screen", "display", "panel", "glass", "charger",
+    "charging", "cover", "case", "back", "part", "parts", "replacement", "replacing", "replace", "repair",
+    "repairing", "fix", "fixing", "service", "servicing", "warranty", "insurance", "tax", "pta", "duty",
+    "registration", "data", "package", "bundle", "installment", "installments", "emi",
+}
+
+
+@dataclass
+class Route:
+    intent: Optional[str]
+    budget: Optional[float] = None
+    priority: str = DEFAULT_PRIORITY
+    intents: set = field(default_factory=set)
+    subject: Optional[str] = None   # what a price_check asks the price of
+
+    @property
+    def max_price(self) -> float:
+        return self.budget if self.budget is not None else DEFAULT_BUDGET
+
+
+def _amount(match) -> tuple:
+    """(value, explicit) for an AMOUNT match."""
+    value = float(match.group("number").replace(",", "") or 0)
+    unit = match.group("unit")
+    if unit:
+        value *= UNIT_MULTIPLIERS[unit]
+    explicit = bool(unit or match.group("currency") or match.group("cue"))
+    return value, explicit
+
+
+def price_subject(text: str) -> Optional[str]:
+    """What a price question asks the price of, or None if it is not plain price phrasing."""
+    match = _PRICE_PHRASES.search(text.strip().rstrip("?!. "))
+    if match is None:
+        return None
+    subject = next(group for group in match.groups() if group is not None)
+    words = re.sub(r"[^a-z0-9+]+", " ", subject).split()
+    if not words or NON_PHONE_WORDS.intersection(words):
+        return None
+    return " ".join(words)
+
+
+def route(message: str) -> Route:
+    """Classify a message in one pass over its lowercased text."""
+    intents = set()
+    priorities = set()
+    explicit_budget = None
+    bare_budget = None
+
+    for match in _PATTERN.finditer(message.lower()):
+        keyword = match.group("keyword")
+        if keyword is not None:
+            kind, value = KEYWORDS[keyword]
+            (intents if kind == "intent" else priorities).add(value)
+            continue
+
+        value, explicit = _amount(match)
+        if explicit and explicit_budget is None:
+            explicit_budget = value
+        elif not explicit and bare_budget is None and value >= MIN_BARE_BUDGET:
+            bare_budget = value
+
+    subject = None
+    if "price_check" in intents:
+        subject = price_subject(message.lower())
+        if subject is None:
+            intents.discard("price_check")
+
+    intent = next((i.name for i in INTENTS if i.name in intents), None)
+    priority = next((p for p in _PRIORITY_ORDER if p in priorities), DEFAULT_PRIORITY)
+    budget = explicit_budget if explicit_budget is not None else bare_budget
+    return Route(intent=intent, budget=budget, priority=priority, intents=intents, subject=subject)
+
+
+if __name__ == "__main__":
+    import json
+    import os
+    import timeit
+
+    corpus_path = os.path.join(os.path.dirname(__file__), "intent_corpus.jsonl")
+    with open(corpus_path) as f:
+        corpus = [json.loads(line) for line in f if line.strip()]
+
+    failures = 0
+    for case in corpus:
+        result = route(case["message"])
+        got = {"intent": result.intent, "budget": result.budget, "priority": result.priority}
+        expected = {key: case[key] for key in got if key in case}
+        if any(got[key] != value for key, value in expected.items()):
+            failures += 1
+            print(f"[ROUTER] MISMATCH {case['message']!r}: expected {expected}, got {got}")
+    print(f"[ROUTER] {len(corpus) - failures}/{len(corpus)} corpus cases match")
+
+    messages = [case["message"] for case in corpus]
+    runs = 200
+    seconds = timeit.timeit(lambda: [route(m) for m in messages], number=runs)
+    print(f"[ROUTER] route(): {seconds / (runs * len(messages)) * 1e6:.1f} µs per message")
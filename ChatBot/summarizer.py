@@ -0,0 +1,86 @@
+import asyncio
+import os
+
+from langchain_core.messages import HumanMessage, SystemMessage
+
+import llm
+from cache import TTLCache
+from logs import get_logger
+from ChatBot.crud import get_conversation_summary, get_messages_after, save_conversation_summary
+
+# Messages kept verbatim in the prompt; older ones are folded into the summary
+CHAT_RECENT_MESSAGES = int(os.getenv("CHAT_RECENT_MESSAGES", "10"))
+# Fold once at least this many messages have dropped out of the recent window
+CHAT_SUMMARY_BATCH = int(os.getenv("CHAT_SUMMARY_BATCH", "4"))
+
+SUMMARY_PROMPT = """
+You maintain a running summary of a conversation between a user and a mobile phone expert assistant.
+Update the summary with the new messages below. Keep facts the assistant will need later:
+the user's phones, budget, priorities, questions already answered and any decisions made.
+Write at most 150 words of plain text, no headings, no lists.
+"""
+
+logger = get_logger(__name__)
+
+_in_progress = set()
+_tasks = set()
+
+# Messages after summarized_until per conversation, counted locally between updates so a
+# turn only costs Mongo reads once a fold is due; unknown (e.g. after a restart) means read once
+_unsummarized = TTLCache(maxsize=10000, ttl=3600)
+
+
+async def update_summary(conversation_id):
+    """Fold messages that fell out of the recent window into the conversation summary."""
+    state = await get_conversation_summary(conversation_id)
+    messages = await get_messages_after(conversation_id, state["summarized_until"])
+
+    to_fold = messages[:-CHAT_RECENT_MESSAGES] if len(messages) > CHAT_RECENT_MESSAGES else []
+    if len(to_fold) < CHAT_SUMMARY_BATCH:
+        _unsummarized.set(conversation_id, len(messages))
+        return
+
+    transcript = "\n".join(f"{m['role']}: {m['content']}" for m in to_fold)
+    summary = await llm.agenerate([
+        SystemMessage(content=SUMMARY_PROMPT),
+        HumanMessage(content=f"Current summary:\n{state['summary'] or '(none)'}\n\nNew messages:\n{transcript}"),
+    ])
+
+    await save_conversation_summary(conversation_id, summary.strip(), to_fold[-1]["created_at"])
+    _unsummarized.set(conversation_id, len(messages) - len(to_fold))
+
+
+async def _run(conversation_id):
+    try:
+        await update_summary(conversation_id)
+    except Exception:
+        logger.exception("Conversation summary update failed", extra={"conversation_id": conversation_id})
+    finally:
+        _in_progress.discard(conversation_id)
+
+
+def schedule_summary_update(conversation_id, new_messages: int = 2):
+    """
+    Count a saved turn and, once a batch of messages has left the recent window, update the
+    summary in the background; at most one update per conversation at a time.
+    """
+    count = _unsummarized.get(conversation_id)
+    if count is not None:
+        count += new_messages
+        _unsummarized.set(conversation_id, count)
+        if count - CHAT_RECENT_MESSAGES < CHAT_SUMMARY_BATCH:
+            return
+
+    if conversation_id in _in_progress:
+        return
+    _in_progress.add(conversation_id)
+
+    task = asyncio.create_task(_run(conversation_id))
+    _tasks.add(task)
+    task.add_done_callback(_tasks.discard)
+
+
+async def drain(timeout: float = 10.0):
+    """Wait for in-flight summary updates (lifespan shutdown)."""
+    if _tasks:
+        await asyncio.wait(set(_tasks), timeout=timeout)
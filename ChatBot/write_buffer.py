@@ -0,0 +1,138 @@
+import asyncio
+
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+
+import metrics
+from logs import get_logger
+
+logger = get_logger(__name__)
+
+DUPLICATE_KEY = 11000
+
+
+class TurnWriteBuffer:
+    """
+    Write-behind buffer for chat turns.
+
+    Turns are queued in memory and flushed every `flush_interval` seconds (or
+    as soon as `max_batch` turns are waiting) with one insert_many for all
+    their messages and one bulk_write of conversation updated_at bumps.
+    Turns being flushed stay visible to pending() until the insert is
+    acknowledged. A failed flush puts the messages that were not written
+    back for the next attempt, and stop() keeps flushing until the buffer
+    is empty so shutdown does not drop turns.
+    """
+
+    def __init__(self, messages_col, conversations_col, flush_interval: float = 0.5, max_batch: int = 200):
+        self.messages_col = messages_col
+        self.conversations_col = conversations_col
+        self.flush_interval = flush_interval
+        self.max_batch = max_batch
+        self._pending = []
+        self._in_flight = []
+        self._wake = asyncio.Event()
+        self._flush_lock = asyncio.Lock()
+        self._task = None
+
+    def add(self, messages: list):
+        """Queue the message documents of one turn."""
+        self._pending.append(messages)
+        if len(self._pending) >= self.max_batch:
+            self._wake.set()
+
+    def pending(self, conversation_id) -> list:
+        """Queued and in-flight messages of a conversation, oldest first."""
+        return [
+            msg
+            for turn in self._in_flight + self._pending
+            for msg in turn
+            if msg["conversation_id"] == conversation_id
+        ]
+
+    async def flush(self):
+        async with self._flush_lock:
+            batch, self._pending = self._pending, []
+            if not batch:
+                return
+            self._in_flight = batch
+
+            messages = [msg for turn in batch for msg in turn]
+            failed, error = set(), None
+            try:
+                await self.messages_col.insert_many(messages, ordered=False)
+            except BulkWriteError as e:
+                # Messages keep their _id across retries, so duplicates were saved by an earlier attempt
+                failed = {
+                    err["index"] for err in e.details.get("writeErrors", []) if err.get("code") != DUPLICATE_KEY
+                }
+                if e.details.get("writeConcernErrors"):
+                    failed = set(range(len(messages)))
+                error = e if failed else None
+            except BaseException:
+                # Including cancellation by stop(); nothing is known to be written
+                self._pending[:0] = batch
+                self._in_flight = []
+                raise
+
+            # Requeue only what was not written, still grouped by turn
+            if failed:
+                retry, start = [], 0
+                for turn in batch:
+                    left = [msg for i, msg in enumerate(turn, start) if i in failed]
+                    start += len(turn)
+                    if left:
+                        retry.append(left)
+                self._pending[:0] = retry
+            self._in_flight = []
+
+            last_activity = {}
+            for i, msg in enumerate(messages):
+                if i not in failed:
+                    cid = msg["conversation_id"]
+                    last_activity[cid] = max(last_activity.get(cid, msg["created_at"]), msg["created_at"])
+
+            if last_activity:
+                await self.conversations_col.bulk_write([
+                    UpdateOne({"_id": cid}, {"$max": {"updated_at": updated_at}})
+                    for cid, updated_at in last_activity.items()
+                ], ordered=False)
+            if error is not None:
+                raise error
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            try:
+                await self.flush()
+            except Exception as e:
+                metrics.errors_total.inc(stage="chat_flush")
+                logger.warning("Write buffer flush failed", extra={"turns_kept": len(self._pending), "error": str(e)})
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self, attempts: int = 5):
+        """Stop the flush loop and drain the buffer."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+        for attempt in range(attempts):
+            try:
+                await self.flush()
+                return
+            except Exception as e:
+                logger.warning("Final write buffer flush failed", extra={"attempt": attempt + 1, "error": str(e)})
+                await asyncio.sleep(0.5 * (attempt + 1))
+
+        logger.error("Dropping unsaved chat turns", extra={"turns": len(self._pending)})
@@ -1,9 +1,17 @@
 import os
+import threading
+import time
 import cv2
+import numpy as np
 import matplotlib.pyplot as plt
 from shapely.geometry import Polygon
 from ultralytics import YOLO
 
+import metrics
+from logs import get_logger
+
+logger = get_logger(__name__)
+
 
 # Define damage measurement type
 DAMAGE_MEASUREMENT = {
@@ -43,42 +51,90 @@ def process_yolo_result(result, side_name):
     return {side_name: damages}
 
 
-def analyze_phone_images(model_path, side_images, show_output=True, save_output=False):
+_models = {}
+_models_lock = threading.Lock()
+# Ultralytics predictors are not thread-safe; one inference at a time per process
+_predict_lock = threading.Lock()
+
+
+def load_model(model_path):
+    """YOLO model for model_path, loaded once per process and reused."""
+    model = _models.get(model_path)
+    if model is None:
+        with _models_lock:
+            model = _models.get(model_path)
+            if model is None:
+                model = _models[model_path] = YOLO(model_path)
+    return model
+
+
+def decode_image(data: bytes):
+    """Decode encoded image bytes (JPEG, PNG, ...) into a BGR array without touching disk."""
+    image = cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_COLOR)
+    if image is None:
+        raise ValueError("Not a decodable image")
+    return image
+
+
+def detect_damages(model_path, side_images, output_dir=None, timings=None):
     """
-    Runs YOLO segmentation on all VALID phone side images.
-    Displays each result inline with Matplotlib.
+    Runs YOLO segmentation on each side's image (BGR array or file path).
+    Annotated images are written to output_dir/{side}_output.jpg when
+    output_dir is given; per-side inference time goes into timings.
+    Returns (damage_json, annotated images by side).
     """
-    model = YOLO(model_path)
+    model = load_model(model_path)
     final_output = {"damages": {}}
+    annotated = {}
+
+    for side, image in side_images.items():
+        if image is None:
+            continue
 
-    os.makedirs("outputs", exist_ok=True)
+        start = time.perf_counter()
+        with _predict_lock:
+            result = model.predict(image, verbose=False, save=False)[0]
+        elapsed = time.perf_counter() - start
+        metrics.yolo_inference_seconds.observe(elapsed, side=side)
+        if timings is not None:
+            timings[f"yolo_{side}"] = elapsed
 
+        annotated[side] = result.plot()  # returns annotated frame
+        if output_dir:
+            output_path = os.path.join(output_dir, f"{side}_output.jpg")
+            cv2.imwrite(output_path, annotated[side])
+
+        final_output["damages"].update(process_yolo_result(result, side))
+
+    return final_output, annotated
+
+
+def analyze_phone_images(model_path, side_images, show_output=True, save_output=False, output_dir="outputs"):
+    """
+    Runs YOLO segmentation on all VALID phone side images.
+    Displays each result inline with Matplotlib.
+    """
+    valid = {}
     for side, path in side_images.items():
         if not path or not os.path.exists(path):
-            print(f"[SKIPPED] No valid image found for side: {side}")
+            logger.info("No valid image for side, skipped", extra={"side": side})
             continue
+        logger.info("Processing side image", extra={"side": side, "path": path})
+        valid[side] = path
 
-        print(f"[PROCESSING] {side} → {path}")
-        results = model.predict(path, verbose=False, save=False)
-        result = results[0]
+    if save_output:
+        os.makedirs(output_dir, exist_ok=True)
 
-        # Plot YOLO detections
-        res_img = result.plot()  # returns annotated frame
-        output_path = os.path.join("outputs", f"{side}_output.jpg")
+    final_output, annotated = detect_damages(model_path, valid, output_dir=output_dir if save_output else None)
 
-        if save_output:
-            cv2.imwrite(output_path, res_img)
-            print(f"[SAVED] {output_path}")
-
-        if show_output:
+    if show_output:
+        for side, res_img in annotated.items():
             plt.figure(figsize=(8, 6))
             plt.imshow(cv2.cvtColor(res_img, cv2.COLOR_BGR2RGB))
             plt.title(f"{side.capitalize()} - Detected Damages")
             plt.axis("off")
             plt.show()
 
-        final_output["damages"].update(process_yolo_result(result, side))
-
     return final_output
 
 
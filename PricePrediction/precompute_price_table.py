@@ -0,0 +1,131 @@
+"""
+Precompute base prices for the most common (model, RAM, storage) configurations.
+
+For every configuration the trained forest is evaluated once per point of the
+condition_score grid (0–20, PRICE_TABLE_STEP apart) at PRICE_TABLE_TEMPLATE,
+and one compact document per phone model is written to `price_table`:
+
+    {"_id": "pixel 7a", "version": "...", "step": 1.0, "template": {...},
+     "prices": {"6|128": [41000, 42500, ...]}, "built_at": ...}
+
+run_pipeline() looks base prices up there, interpolating between grid
+points, and falls back to live training/inference for combinations that
+are missing, or when the worker's forest has moved on from the "version"
+the table was built from.
+
+Usage:
+    python -m PricePrediction.precompute_price_table --limit 3000
+"""
+import argparse
+from datetime import datetime, timezone
+
+import pandas as pd
+from pymongo.collection import Collection
+
+from models import UsedMobile
+from PricePrediction.predict_price_service import (
+    collection,
+    price_table_collection,
+    get_price_model,
+    preprocess_input_mobile,
+    price_table_slot,
+    _model_key,
+    _template_features,
+    PRICE_TABLE_STEP,
+    PRICE_TABLE_TEMPLATE,
+)
+from logs import get_logger
+
+logger = get_logger(__name__)
+
+# Tables older than this are dropped by Mongo's TTL monitor
+PRICE_TABLE_MAX_AGE_SECONDS = 24 * 3600
+
+
+def common_configurations(db: Collection = collection, limit: int = 3000) -> dict:
+    """Return {model name: {(ram, storage), ...}} for the most listed configurations."""
+    pipeline = [
+        {"$match": {"model": {"$type": "string"}, "ram": {"$type": "string"}, "storage": {"$type": "string"}}},
+        {"$group": {
+            "_id": {"model": {"$toLower": "$model"}, "ram": "$ram", "storage": "$storage"},
+            "count": {"$sum": 1},
+        }},
+        {"$sort": {"count": -1}},
+        {"$limit": limit},
+    ]
+
+    configs = {}
+    for row in db.aggregate(pipeline):
+        group = row["_id"]
+        configs.setdefault(group["model"].strip(), set()).add((group["ram"], group["storage"]))
+    return configs
+
+
+def build_table(model_name: str, configurations, db: Collection = collection) -> dict:
+    """Evaluate the trained forest over every configuration × condition_score grid point."""
+    entry = get_price_model(model_name, db)
+
+    grid = [i * PRICE_TABLE_STEP for i in range(int(20 / PRICE_TABLE_STEP) + 1)]
+    rows, slots = [], []
+
+    for ram, storage in configurations:
+        probe = preprocess_input_mobile(UsedMobile(ram=ram, storage=storage))
+        slot = price_table_slot(probe.at[0, "ram"], probe.at[0, "storage"])
+        if slot in slots:
+            continue
+        slots.append(slot)
+
+        for score in grid:
+            mobile = UsedMobile(ram=ram, storage=storage, condition_score=score, **PRICE_TABLE_TEMPLATE)
+            rows.append(preprocess_input_mobile(mobile))
+
+    if not rows:
+        return None
+
+    X = pd.concat(rows, ignore_index=True).drop(columns=["model", "brand"], errors="ignore")
+    predictions = entry["model"].predict(X)
+
+    prices = {}
+    for i, slot in enumerate(slots):
+        chunk = predictions[i * len(grid):(i + 1) * len(grid)]
+        prices[slot] = [int(round(p)) for p in chunk]
+
+    return {
+        "_id": _model_key(model_name),
+        "version": entry["version"],
+        "step": PRICE_TABLE_STEP,
+        "template": _template_features(),
+        "prices": prices,
+        "built_at": datetime.now(timezone.utc),
+    }
+
+
+def precompute_price_table(limit: int = 3000, db: Collection = collection,
+                           table_db: Collection = price_table_collection) -> int:
+    """Rebuild the base-price table. Returns the number of phone models written."""
+    table_db.create_index("built_at", expireAfterSeconds=PRICE_TABLE_MAX_AGE_SECONDS)
+
+    written = 0
+    for model_name, configurations in common_configurations(db, limit).items():
+        try:
+            table = build_table(model_name, configurations, db)
+        except Exception as e:
+            logger.warning("Skipping price table", extra={"phone_model": model_name, "error": str(e)})
+            continue
+
+        if table:
+            table_db.replace_one({"_id": table["_id"]}, table, upsert=True)
+            written += 1
+            logger.info("Price table written", extra={"phone_model": model_name, "configurations": len(table["prices"])})
+
+    return written
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Precompute the base-price lookup table")
+    parser.add_argument("--limit", type=int, default=3000,
+                        help="number of most common (model, RAM, storage) combinations")
+    args = parser.parse_args()
+
+    count = precompute_price_table(limit=args.limit)
+    print(f"[PRICE TABLE] Wrote tables for {count} phone models")
@@ -1,11 +1,14 @@
 from typing import List
 from datetime import datetime, timedelta, timezone
+import copy
+import hashlib
+import math
 from pymongo.collection import Collection
 from sklearn.ensemble import RandomForestRegressor
 import pandas as pd
 import re
 import os
-from pymongo import MongoClient
+import time
 from dotenv import load_dotenv
 
 
@@ -13,43 +16,111 @@ load_dotenv()
 
 
 from models import UsedMobile
+from cache import TTLCache
+import metrics
+import mongo
+from logs import get_logger
 
-MONGO_URI = os.getenv("MONGO_CONNECTION_STRING")
+logger = get_logger(__name__)
 
-DB_NAME = "MobileDB"
 COLLECTION_NAME = "used_mobiles"
-client = MongoClient(MONGO_URI)
-db = client[DB_NAME]
-collection = db[COLLECTION_NAME]
+collection = mongo.collection(COLLECTION_NAME)
+
+# Trained models are re-checked against Mongo after MODEL_TTL_SECONDS; results are memoized per model version
+MODEL_TTL_SECONDS = int(os.getenv("PRICE_MODEL_TTL_SECONDS", "900"))
+RESULT_CACHE_SIZE = int(os.getenv("PRICE_RESULT_CACHE_SIZE", "4096"))
+
+# Incremental retraining
+N_ESTIMATORS = 100
+MIN_BATCH_TREES = 5
+RETIRE_EXPIRED_FRACTION = 0.5     # retire a batch's trees once half its listings expired
+FULL_REFIT_FRACTION = 0.5         # refit from scratch once half the forest would be rebuilt
+
+model_registry = TTLCache(maxsize=256)                       # last forest + lineage per phone model
+fresh_models = TTLCache(maxsize=256, ttl=MODEL_TTL_SECONDS)  # models checked against Mongo recently
+result_cache = TTLCache(maxsize=RESULT_CACHE_SIZE)
+
+# Precomputed base prices (see precompute_price_table.py)
+PRICE_TABLE_COLLECTION = "price_table"
+PRICE_TABLE_REFRESH_SECONDS = int(os.getenv("PRICE_TABLE_REFRESH_SECONDS", "300"))
+PRICE_TABLE_STEP = 1.0          # condition_score grid spacing (0–20)
+PRICE_TABLE_VARYING = ("ram", "storage", "condition_score")
+
+# Feature values the table is evaluated at (the /price-prediction/ form defaults)
+PRICE_TABLE_TEMPLATE = {
+    "is_panel_changed": False,
+    "screen_crack": False,
+    "panel_dot": False,
+    "panel_line": False,
+    "panel_shade": False,
+    "camera_lens_ok": True,
+    "fingerprint_ok": True,
+    "pta_approved": True,
+}
+
+price_table_collection = mongo.collection(PRICE_TABLE_COLLECTION)
+price_tables = TTLCache(maxsize=1024, ttl=PRICE_TABLE_REFRESH_SECONDS)
+
+metrics.register_cache("price_models", fresh_models)
+metrics.register_cache("price_results", result_cache)
+metrics.register_cache("price_tables", price_tables)
+
+
+def _training_query(input_model: str) -> dict:
+    return {
+        "model": {"$regex": re.escape(input_model), "$options": "i"}
+    }
 
 
-def fetch_training_data(input_model: str, db: Collection = collection) -> List[UsedMobile]:
-    """Fetch training data from MongoDB (OLX listings).
+def fetch_listing_ids(input_model: str, db: Collection = collection) -> set:
+    """Ids of the live listings for a model (TTL index removes expired ones)."""
+    return {doc["_id"] for doc in db.find(_training_query(input_model), {"_id": 1})}
+
+
+def fetch_training_records(input_model: str, db: Collection = collection, ids=None, min_records: int = 15) -> List[tuple]:
+    """Fetch (listing id, UsedMobile) pairs from MongoDB (OLX listings).
        TTL index already clears old data, so no age filter needed.
+       Pass ids to fetch only those listings.
     """
 
-    query = {
-        "model": {"$regex": re.escape(input_model), "$options": "i"}
-    }
+    query = _training_query(input_model)
+    if ids is not None:
+        query["_id"] = {"$in": list(ids)}
+
+    records = []
+    fetch_time = validation_time = 0.0
 
-    training_data = []
+    start = time.perf_counter()
     result = db.find(query)
 
     for doc in result:
+        fetched = time.perf_counter()
+        fetch_time += fetched - start
         try:
             # Normalize image field
             if "images" in doc and isinstance(doc["images"], str):
                 doc["images"] = [img.strip() for img in doc["images"].split(",") if img.strip()]
             
-            training_data.append(UsedMobile(**doc))
+            records.append((doc.get("_id"), UsedMobile(**doc)))
 
         except Exception as e:
-            print("Skipping record:", e)
+            logger.warning("Skipping invalid listing", extra={"listing_id": str(doc.get("_id")), "error": str(e)})
+        start = time.perf_counter()
+        validation_time += start - fetched
 
-    if len(training_data) < 15:
-        raise RuntimeError(f"⚠️ Only {len(training_data)} fresh records found. Need 150 minimum.")
+    fetch_time += time.perf_counter() - start
+    metrics.record_stage("mongo_fetch", fetch_time)
+    metrics.record_stage("validation", validation_time)
 
-    return training_data
+    if len(records) < min_records:
+        raise RuntimeError(f"⚠️ Only {len(records)} fresh records found. Need 150 minimum.")
+
+    return records
+
+
+def fetch_training_data(input_model: str, db: Collection = collection) -> List[UsedMobile]:
+    """Fetch training data from MongoDB (OLX listings)."""
+    return [mobile for _, mobile in fetch_training_records(input_model, db)]
 
 
 
@@ -154,20 +225,47 @@ def train_model(training_df: pd.DataFrame) -> RandomForestRegressor:
     X = df.drop(columns=["price"])
     y = df["price"]
 
-    model = RandomForestRegressor(n_estimators=100, random_state=42)
+    model = RandomForestRegressor(n_estimators=N_ESTIMATORS, random_state=42)
     model.fit(X, y)
 
     return model
 
 
 
-def predict_price_range(model: RandomForestRegressor, input_df: pd.DataFrame, mobile: UsedMobile, ai_flags: dict):
-    """Predict min/max price using hybrid AI + user fallback logic."""
-    
-    df = input_df.copy()
-    df.drop(columns=["model", "brand"], inplace=True, errors="ignore")
+def update_model(model: RandomForestRegressor, training_df: pd.DataFrame, n_new_trees: int,
+                 retire: List[int] = ()) -> RandomForestRegressor:
+    """
+    Incrementally update a trained forest: drop the trees at the `retire`
+    indices, then warm-start n_new_trees more trees fitted on training_df only.
+    Returns an updated copy; the trees themselves are shared, not refitted.
+    """
+
+    retire = set(retire)
+    model = copy.copy(model)
+    model.estimators_ = [tree for i, tree in enumerate(model.estimators_) if i not in retire]
+
+    df = training_df.dropna(subset=["price"]) if training_df is not None else None
+    if n_new_trees and df is not None and len(df):
+        X = df.drop(columns=["price"])[list(model.feature_names_in_)]
+        model.set_params(warm_start=True, n_estimators=len(model.estimators_) + n_new_trees)
+        model.fit(X, df["price"])
+
+    model.set_params(n_estimators=len(model.estimators_))
+    return model
+
+
+
+def predict_price_range(model: RandomForestRegressor, input_df: pd.DataFrame, mobile: UsedMobile, ai_flags: dict,
+                        base_price: float = None):
+    """Predict min/max price using hybrid AI + user fallback logic.
+       A precomputed base_price skips model inference.
+    """
     
-    base_price = model.predict(df)[0]
+    if base_price is None:
+        df = input_df.copy()
+        df.drop(columns=["model", "brand"], inplace=True, errors="ignore")
+
+        base_price = model.predict(df)[0]
 
     # Merge AI + user flags
     flags = merge_ai_user_flags(ai_flags, mobile)
@@ -209,24 +307,313 @@ def predict_price_range(model: RandomForestRegressor, input_df: pd.DataFrame, mo
 
 
 
-def run_pipeline(input_mobile: UsedMobile, ai_flags: dict, db: Collection = collection):
+def _model_key(model_name: str) -> str:
+    return (model_name or "").strip().lower()
+
+
+def _lineage_version(batches: List[dict]) -> str:
+    """Fingerprint of the listings (per tree batch) a forest was built from."""
+    digest = hashlib.sha1()
+    for batch in batches:
+        digest.update("\n".join(sorted(str(i) for i in batch["ids"])).encode())
+        digest.update(f"|{batch['n_trees']}|".encode())
+    return digest.hexdigest()[:16]
+
+
+def _record_model_stats(model: RandomForestRegressor, rows: int):
+    nodes = sum(tree.tree_.node_count for tree in model.estimators_)
+    metrics.pipeline_training_rows.observe(rows)
+    metrics.pipeline_model_nodes.observe(nodes)
+
+    timings = metrics.current_timings.get()
+    if timings is not None:
+        timings["training_rows"] = rows
+        timings["model_nodes"] = nodes
+
+
+def _full_train(model_name: str, db: Collection) -> dict:
+    records = fetch_training_records(model_name, db)
+    if not records:
+        raise RuntimeError("No training data found for this model.")
+
+    with metrics.stage("preprocess"):
+        training_df = preprocess_training_data([mobile for _, mobile in records])
+    with metrics.stage("train"), metrics.timer(metrics.pipeline_training_seconds, kind="full"):
+        model = train_model(training_df)
+    _record_model_stats(model, len(training_df))
+
+    now = datetime.now(timezone.utc)
+    batches = [{
+        "ids": frozenset(listing_id for listing_id, _ in records),
+        "n_trees": N_ESTIMATORS,
+        "trained_at": now,
+        "kind": "full",
+    }]
+
+    return {
+        "model": model,
+        "version": _lineage_version(batches),
+        "trained_at": now,
+        "batches": batches,
+    }
+
+
+def _incremental_train(model_name: str, previous: dict, db: Collection) -> dict:
+    """
+    Bring a previously trained forest up to date with the live listings.
+    Trees of batches whose listings mostly expired are retired; new listings
+    (plus the live leftovers of retired batches) get their own batch of trees,
+    sized in proportion to their share of the data. Returns None when a
+    full refit is cheaper or required.
+    """
+    with metrics.stage("mongo_fetch"):
+        live_ids = fetch_listing_ids(model_name, db)
+    known_ids = frozenset().union(*(b["ids"] for b in previous["batches"]))
+
+    if live_ids == known_ids:
+        return previous
+
+    kept, retire_idx, to_fit = [], [], set(live_ids - known_ids)
+    offset = 0      # tree indices follow batch order in estimators_
+    for batch in previous["batches"]:
+        live = batch["ids"] & live_ids
+        if len(live) < (1 - RETIRE_EXPIRED_FRACTION) * len(batch["ids"]):
+            retire_idx.extend(range(offset, offset + batch["n_trees"]))
+            to_fit |= live
+        else:
+            kept.append(batch)
+        offset += batch["n_trees"]
+
+    if not kept or len(to_fit) > FULL_REFIT_FRACTION * len(live_ids):
+        return None
+
+    n_new_trees = 0
+    records = []
+    if to_fit:
+        records = fetch_training_records(model_name, db, ids=to_fit, min_records=0)
+        if records:
+            n_new_trees = max(MIN_BATCH_TREES, round(N_ESTIMATORS * len(records) / len(live_ids)))
+
+    try:
+        with metrics.stage("preprocess"):
+            training_df = preprocess_training_data([mobile for _, mobile in records]) if records else None
+    except ValueError:
+        return None     # batch has no usable RAM/storage to fall back on
+
+    with metrics.stage("train"), metrics.timer(metrics.pipeline_training_seconds, kind="incremental"):
+        model = update_model(previous["model"], training_df, n_new_trees, retire=retire_idx)
+
+    # update_model fits nothing when no listing in the batch has a price; record what was really added,
+    # since later retirements index estimators_ by the batches' tree counts
+    n_new_trees = len(model.estimators_) - (len(previous["model"].estimators_) - len(retire_idx))
+    if not model.estimators_:
+        return None
+    _record_model_stats(model, len(records))
+
+    now = datetime.now(timezone.utc)
+    batches = kept
+    if n_new_trees:
+        batches = kept + [{
+            "ids": frozenset(to_fit),
+            "n_trees": n_new_trees,
+            "trained_at": now,
+            "kind": "incremental",
+        }]
+
+    logger.info("Price model retrained incrementally", extra={
+        "phone_model": model_name,
+        "new_trees": n_new_trees,
+        "listings": len(records),
+        "retired_trees": len(retire_idx),
+    })
+
+    return {
+        "model": model,
+        "version": _lineage_version(batches),
+        "trained_at": now,
+        "batches": batches,
+    }
+
+
+def get_price_model(model_name: str, db: Collection = collection) -> dict:
+    """
+    Return {"model", "version", "trained_at", "batches"} for a phone model.
+    The trained forest is reused until MODEL_TTL_SECONDS expires, then brought
+    up to date incrementally; concurrent requests for the same phone model
+    share a single training run. The version fingerprints the tree batches
+    and the listings each was trained on; each new version is logged with
+    its model_lineage().
+    """
+    key = _model_key(model_name)
+
+    def _refresh():
+        previous = model_registry.get(key)
+        entry = None
+        if previous is not None:
+            entry = _incremental_train(model_name, previous, db)
+        if entry is None:
+            entry = _full_train(model_name, db)
+
+        if previous is None or entry["version"] != previous["version"]:
+            model_registry.set(key, entry)
+            # Results computed by any older forest for this phone model are stale
+            result_cache.invalidate(lambda k: k[0] == key and k[1] != entry["version"])
+            logger.info("Price model updated", extra={
+                "phone_model": model_name,
+                "version": entry["version"],
+                "lineage": model_lineage(model_name),
+            })
+        return entry
+
+    return fresh_models.get_or_compute(key, _refresh)
+
+
+def model_lineage(model_name: str) -> List[dict]:
+    """Describe the tree batches of the current forest for a phone model."""
+    entry = model_registry.get(_model_key(model_name))
+    if entry is None:
+        return []
+    return [
+        {
+            "kind": batch["kind"],
+            "listings": len(batch["ids"]),
+            "n_trees": batch["n_trees"],
+            "trained_at": batch["trained_at"].isoformat(),
+        }
+        for batch in entry["batches"]
+    ]
+
+
+def _normalize_value(value):
+    if value is None or (isinstance(value, float) and math.isnan(value)):
+        return None
+    if hasattr(value, "item"):          # numpy scalar -> python scalar
+        value = value.item()
+    return value
+
+
+def price_cache_key(model_name: str, version: str, input_df: pd.DataFrame, mobile: UsedMobile, ai_flags: dict) -> tuple:
+    """Key a prediction by model version, normalized feature vector and flags."""
+    features = input_df.drop(columns=["model", "brand"], errors="ignore").iloc[0]
+    feature_vector = tuple(sorted((col, _normalize_value(val)) for col, val in features.items()))
+
+    merged_flags = tuple(sorted(merge_ai_user_flags(ai_flags, mobile).items()))
+    detected = tuple(sorted((k, bool(v)) for k, v in ai_flags.items()))
+
+    return (_model_key(model_name), version, feature_vector, merged_flags, detected)
+
+
+def price_table_slot(ram, storage) -> str:
+    return f"{ram}|{storage}"
+
+
+def _template_features() -> dict:
+    df = preprocess_input_mobile(UsedMobile(**PRICE_TABLE_TEMPLATE))
+    return {
+        col: _normalize_value(val)
+        for col, val in df.iloc[0].items()
+        if col not in PRICE_TABLE_VARYING + ("model", "brand")
+    }
+
+
+def lookup_base_price(model_name: str, input_df: pd.DataFrame, table_db: Collection = price_table_collection):
+    """
+    Return the precomputed base price for this input, or None (live
+    inference) when the (model, RAM, storage) combination is not in the
+    table, the input differs from the template the table was evaluated at,
+    the score is outside the table's grid, or this worker already holds a
+    forest other than the one the table was built from.
+
+    Scores between grid points are interpolated linearly between the two
+    nearest precomputed prices.
+    """
+    key = _model_key(model_name)
+    table = price_tables.get_or_compute(key, lambda: table_db.find_one({"_id": key}) or {})
+    if not table:
+        return None
+
+    # A table built from an older forest must not override a newer (e.g. incrementally retrained) one
+    current = model_registry.get(key)
+    if current is not None and table.get("version") != current["version"]:
+        return None
+
+    row = input_df.iloc[0]
+    score = _normalize_value(row.get("condition_score"))
+    if score is None:
+        return None
+
+    for col, val in table.get("template", {}).items():
+        if _normalize_value(row.get(col)) != val:
+            return None
+
+    prices = table.get("prices", {}).get(
+        price_table_slot(_normalize_value(row.get("ram")), _normalize_value(row.get("storage")))
+    )
+    if not prices:
+        return None
+
+    step = table.get("step", PRICE_TABLE_STEP)
+    position = score / step
+    if position < 0 or position > len(prices) - 1:
+        return None
+    lo = math.floor(position)
+    hi = min(lo + 1, len(prices) - 1)
+    return prices[lo] + (prices[hi] - prices[lo]) * (position - lo)
+
+
+def run_pipeline(input_mobile: UsedMobile, ai_flags: dict, db: Collection = collection, timings: dict = None):
     """
     Final integrated pipeline:
-    - Fetch dataset from Mongo
-    - Train model
+    - Use the precomputed base price when the configuration is in the table
+    - Otherwise fetch dataset from Mongo and train model (cached per phone model)
     - Apply condition_score + hybrid AI fallback logic
-    - Return price range
+    - Return price range (memoized per feature vector + flags + model version)
+    Stage timings, training row count and model size are added to `timings`
+    when a dict is passed, and always exported as histograms.
     """
 
-    training_data = fetch_training_data(input_mobile.model, db)
-    if not training_data:
-        raise RuntimeError("No training data found for this model.")
+    token = metrics.current_timings.set(timings)
+    try:
+        with metrics.stage("total"):
+            return _run_pipeline(input_mobile, ai_flags, db)
+    finally:
+        metrics.current_timings.reset(token)
+
 
+def prefetch_price_model(input_mobile: UsedMobile, db: Collection = collection) -> str:
+    """
+    Warm whatever run_pipeline will need for this phone before its condition
+    score is known: the price table entry when the configuration is covered,
+    otherwise the trained forest. Returns "price_table" or "model".
+    """
+    probe = input_mobile.model_copy(update={"condition_score": 0.0})
+    if lookup_base_price(probe.model, preprocess_input_mobile(probe)) is not None:
+        return "price_table"
+    get_price_model(probe.model, db)
+    return "model"
+
+
+def _predict(model, input_df, input_mobile, ai_flags, base_price=None):
+    with metrics.stage("predict"):
+        return predict_price_range(model, input_df, input_mobile, ai_flags, base_price=base_price)
+
+
+def _run_pipeline(input_mobile: UsedMobile, ai_flags: dict, db: Collection):
     input_df = preprocess_input_mobile(input_mobile)
-    training_df = preprocess_training_data(training_data)
-    model = train_model(training_df)
 
-    return predict_price_range(model, input_df, input_mobile, ai_flags)
+    with metrics.stage("price_table"):
+        base_price = lookup_base_price(input_mobile.model, input_df)
+    if base_price is not None:
+        return _predict(None, input_df, input_mobile, ai_flags, base_price=base_price)
+
+    with metrics.stage("model_lookup"):
+        entry = get_price_model(input_mobile.model, db)
+
+    key = price_cache_key(input_mobile.model, entry["version"], input_df, input_mobile, ai_flags)
+    return result_cache.get_or_compute(
+        key,
+        lambda: _predict(entry["model"], input_df, input_mobile, ai_flags)
+    )
 
 
 
@@ -0,0 +1,170 @@
+# phone_catalog.py
+"""
+In-memory copy of the `phones` catalog.
+
+Phones are kept sorted by price next to a flat array('d') of their prices,
+so a budget window is two bisects, and their precomputed feature matrix is
+ready for ranking. A background thread reloads the catalog on Mongo change
+notifications when the deployment supports change streams, and on a fixed
+interval otherwise. Each reload swaps in a new immutable snapshot, so
+readers never see a half-built catalog.
+"""
+import hashlib
+import re
+import threading
+from array import array
+from bisect import bisect_left, bisect_right
+
+from pymongo.collection import Collection
+from pymongo.errors import PyMongoError
+
+from RecommendationEngine.phone_ranker import PhoneFeatureMatrix, parse_features
+from logs import get_logger
+
+logger = get_logger(__name__)
+
+# A name followed by one of these refers to a different model ("iPhone 15" in "iPhone 15 Pro")
+VARIANT_WORDS = {"pro", "max", "plus", "+", "ultra", "mini", "lite", "fe", "neo", "prime", "s", "e"}
+
+
+class CatalogSnapshot:
+    def __init__(self, phones: list):
+        phones = sorted(phones, key=lambda p: p["price_range"])
+        self.phones = phones
+        self.prices = array("d", (p["price_range"] for p in phones))
+
+        self.matrix = PhoneFeatureMatrix(phones, row=parse_features)
+
+        digest = hashlib.sha1()
+        for phone in phones:
+            digest.update(repr(sorted(phone.items())).encode())
+        self.version = digest.hexdigest()[:16]
+        self._names = None
+
+    @staticmethod
+    def _words(text: str) -> list:
+        return re.sub(r"[^a-z0-9+]+", " ", text.lower()).split()
+
+    def _name_index(self) -> dict:
+        """Normalized phone names and brand-less aliases -> row; built on first lookup."""
+        if self._names is None:
+            names = {}
+            for i, phone in enumerate(self.phones):
+                words = self._words(phone.get("phone_name") or "")
+                aliases = [words, words[1:]]
+                if len(words) >= 3:
+                    aliases.append(words[:1] + words[2:])   # "samsung a54" for "Samsung Galaxy A54"
+                for alias in aliases:
+                    if len(alias) >= 2:
+                        names.setdefault(" ".join(alias), i)
+            self._names = names
+        return self._names
+
+    def find_by_name(self, text: str):
+        """The catalog phone whose (longest) name appears in text, or None."""
+        names = self._name_index()
+        words = self._words(text)
+        for n in range(min(len(words), 8), 1, -1):
+            for i in range(len(words) - n + 1):
+                row = names.get(" ".join(words[i:i + n]))
+                if row is not None and (i + n == len(words) or words[i + n] not in VARIANT_WORDS):
+                    return self.phones[row]
+        return None
+
+    def window(self, lo: float, hi: float) -> range:
+        """Row indices of phones priced within [lo, hi]."""
+        return range(bisect_left(self.prices, lo), bisect_right(self.prices, hi))
+
+    def closest(self, price: float, window: float, limit: int) -> list:
+        """Up to `limit` rows within price ± window, closest to price first."""
+        rows = self.window(price - window, price + window)
+        return sorted(rows, key=lambda i: abs(self.prices[i] - price))[:limit]
+
+
+class PhoneCatalog:
+    def __init__(self, collection: Collection, fields: dict, refresh_seconds: int = 300, watch: bool = True):
+        self.collection = collection
+        self.fields = fields
+        self.refresh_seconds = refresh_seconds
+        self.watch = watch
+        self._snapshot = None
+        self._load_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._listeners = []
+
+    def add_listener(self, callback):
+        """Call callback(version) whenever a reload changes the catalog."""
+        self._listeners.append(callback)
+
+    @property
+    def snapshot(self) -> CatalogSnapshot:
+        """Current snapshot, loading the catalog on first use."""
+        if self._snapshot is None:
+            with self._load_lock:
+                if self._snapshot is None:
+                    self.reload()
+        return self._snapshot
+
+    @property
+    def version(self) -> str:
+        return self.snapshot.version
+
+    def reload(self) -> bool:
+        """Reload from Mongo; returns True when the catalog changed."""
+        phones = list(self.collection.find({"price_range": {"$type": "number"}}, self.fields))
+        snapshot = CatalogSnapshot(phones)
+
+        changed = self._snapshot is None or snapshot.version != self._snapshot.version
+        if changed:
+            self._snapshot = snapshot
+            logger.info("Catalog loaded", extra={"phones": len(phones), "catalog_version": snapshot.version})
+            for callback in self._listeners:
+                callback(snapshot.version)
+        return changed
+
+    def start(self):
+        """Load now and keep refreshing in a background thread."""
+        try:
+            self.snapshot
+        except PyMongoError as e:
+            logger.warning("Initial catalog load failed, will retry on first use", extra={"error": str(e)})
+
+        if self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="phone-catalog", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def _run(self):
+        if self.watch and self._watch_changes():
+            return
+        while not self._stop.wait(self.refresh_seconds):
+            self._safe_reload()
+
+    def _watch_changes(self) -> bool:
+        """Reload on change notifications; returns False if change streams are unavailable."""
+        try:
+            with self.collection.watch(max_await_time_ms=1000) as stream:
+                while not self._stop.is_set():
+                    if stream.try_next() is not None:
+                        # Drain the burst, then reload once
+                        while stream.try_next() is not None:
+                            pass
+                        self._safe_reload()
+            return True
+        except PyMongoError as e:
+            logger.info("Change streams unavailable, polling the catalog",
+                        extra={"refresh_seconds": self.refresh_seconds, "error": str(e)})
+            return False
+
+    def _safe_reload(self):
+        try:
+            self.reload()
+        except PyMongoError as e:
+            logger.warning("Catalog refresh failed", extra={"error": str(e)})
@@ -0,0 +1,193 @@
+# phone_ranker.py
+"""
+Local, deterministic pre-ranking of candidate phones.
+
+Spec fields (as described by models.NewMobile) are parsed into a numeric
+feature row per phone, once per catalog snapshot. A set of candidates becomes a min-max normalized
+matrix, and every priority profile is a weighted score over its columns, so
+ranking N phones is a single matrix-vector product.
+"""
+import re
+import warnings
+
+import numpy as np
+
+from models import NewMobile
+
+SPEC_FIELDS = list(NewMobile.model_fields)
+
+FEATURES = [
+    "chipset_tier",
+    "ram_gb",
+    "storage_gb",
+    "battery_mah",
+    "main_camera_mp",
+    "camera_count",
+    "selfie_camera_mp",
+    "screen_inches",
+    "screen_megapixels",
+    "refresh_hz",
+    "release_year",
+]
+
+# Weights per priority profile (columns not listed weigh 0)
+PROFILES = {
+    "gaming": {
+        "chipset_tier": 0.45, "ram_gb": 0.2, "refresh_hz": 0.15,
+        "battery_mah": 0.1, "storage_gb": 0.05, "release_year": 0.05,
+    },
+    "camera": {
+        "main_camera_mp": 0.35, "camera_count": 0.15, "selfie_camera_mp": 0.15,
+        "chipset_tier": 0.15, "release_year": 0.1, "screen_megapixels": 0.1,
+    },
+    "battery": {
+        "battery_mah": 0.6, "release_year": 0.15, "chipset_tier": 0.15, "ram_gb": 0.1,
+    },
+    "general": {
+        "chipset_tier": 0.25, "ram_gb": 0.15, "battery_mah": 0.15, "main_camera_mp": 0.15,
+        "storage_gb": 0.1, "refresh_hz": 0.1, "release_year": 0.1,
+    },
+}
+
+PRIORITY_KEYWORDS = {
+    "gaming": ["gaming", "performance", "fps"],
+    "camera": ["camera", "photography", "selfie"],
+    "battery": ["battery", "backup", "mah"],
+    "general": ["all round", "balanced", "daily use"],
+}
+
+# Chipset tiers (0–1), first match wins
+CHIPSET_TIERS = [
+    (r"snapdragon\s*8\s*(\+\s*)?gen|snapdragon\s*8\s*elite", 1.0),
+    (r"apple\s*a1[5-9]|\ba1[5-9]\b", 1.0),
+    (r"dimensity\s*9\d{3}", 0.95),
+    (r"exynos\s*2[1-4]\d{2}|tensor", 0.85),
+    (r"snapdragon\s*8\d{2}|apple\s*a1[2-4]|\ba1[2-4]\b", 0.85),
+    (r"dimensity\s*8\d{3}|snapdragon\s*7\s*(\+\s*)?gen\s*[2-9]", 0.75),
+    (r"snapdragon\s*7|dimensity\s*(7\d{3}|1\d{3})|kirin\s*9", 0.6),
+    (r"exynos\s*1[3-5]\d{2}|snapdragon\s*6\s*gen|dimensity\s*6\d{3}", 0.5),
+    (r"helio\s*g9\d|snapdragon\s*6", 0.4),
+    (r"helio|exynos\s*(8|9)\d{2}|snapdragon\s*4", 0.25),
+    (r"unisoc|spreadtrum", 0.1),
+]
+_CHIPSET_PATTERNS = [(re.compile(p, re.IGNORECASE), tier) for p, tier in CHIPSET_TIERS]
+
+_NUMBER = re.compile(r"\d+(?:\.\d+)?")
+_MP = re.compile(r"(\d+(?:\.\d+)?)\s*mp", re.IGNORECASE)
+_MAH = re.compile(r"(\d{3,5})\s*mah", re.IGNORECASE)
+_INCHES = re.compile(r"(\d+(?:\.\d+)?)\s*(?:inches|inch|\"|in\b)", re.IGNORECASE)
+_RESOLUTION = re.compile(r"(\d{3,4})\s*[x×]\s*(\d{3,4})", re.IGNORECASE)
+_HZ = re.compile(r"(\d{2,3})\s*hz", re.IGNORECASE)
+_GB = re.compile(r"(\d+(?:\.\d+)?)\s*(gb|tb)", re.IGNORECASE)
+
+
+def resolve_priority(priority: str) -> str:
+    """Map a free-text priority ("gaming performance", "camera") onto a profile."""
+    text = (priority or "").lower()
+    if text in PROFILES:
+        return text
+    for key, words in PRIORITY_KEYWORDS.items():
+        if any(word in text for word in words):
+            return key
+    return "general"
+
+
+def _max_match(pattern, text):
+    values = [float(m) for m in pattern.findall(text)]
+    return max(values) if values else np.nan
+
+
+def _capacity_gb(text):
+    values = [float(n) * (1024 if unit.lower() == "tb" else 1) for n, unit in _GB.findall(text)]
+    if values:
+        return max(values)
+    numbers = [float(n) for n in _NUMBER.findall(text)]
+    return max(numbers) if numbers else np.nan
+
+
+def _chipset_tier(text):
+    for pattern, tier in _CHIPSET_PATTERNS:
+        if pattern.search(text):
+            return tier
+    return np.nan
+
+
+def parse_features(phone: dict) -> np.ndarray:
+    """Parse one phone document into a row of raw FEATURES (NaN when unknown)."""
+    def field(name):
+        value = phone.get(name)
+        return str(value) if value is not None else ""
+
+    # Specs missing from their own field are often mentioned in the description
+    description = field("description")
+
+    def spec(name):
+        return field(name) or description
+
+    chipset = " ".join([field("chipset"), field("cpu")]).strip() or description
+    main_camera = spec("main_camera")
+    resolution = _RESOLUTION.search(spec("screen_resolution"))
+    release_year = phone.get("release_year")
+
+    return np.array([
+        _chipset_tier(chipset),
+        _capacity_gb(field("ram")) if field("ram") else np.nan,
+        _capacity_gb(field("storage")) if field("storage") else np.nan,
+        _max_match(_MAH, spec("battery_capacity")),
+        _max_match(_MP, main_camera),
+        float(len(_MP.findall(field("main_camera")))) or np.nan,
+        _max_match(_MP, field("selfie_camera")),
+        _max_match(_INCHES, spec("screen_size")),
+        int(resolution.group(1)) * int(resolution.group(2)) / 1e6 if resolution else np.nan,
+        _max_match(_HZ, " ".join([field("screen_resolution"), field("screen_size"), description])),
+        float(release_year) if isinstance(release_year, (int, float)) else np.nan,
+    ], dtype=np.float64)
+
+
+def normalize(raw: np.ndarray) -> np.ndarray:
+    """
+    Min-max normalize each column to 0–1. A column whose known values are all
+    equal scores 1; unknown values score 0, like the worst known value.
+    """
+    if raw.size == 0:
+        return raw
+
+    with warnings.catch_warnings():
+        # All-NaN columns are expected (spec missing for every candidate)
+        warnings.simplefilter("ignore", RuntimeWarning)
+        lo = np.nanmin(raw, axis=0)
+        hi = np.nanmax(raw, axis=0)
+
+    span = hi - lo
+    constant = ~(span > 0)
+    X = (raw - lo) / np.where(constant, 1.0, span)
+    X[:, constant] = np.where(np.isnan(raw[:, constant]), 0.0, 1.0)
+    return np.nan_to_num(X, nan=0.0)
+
+
+PROFILE_WEIGHTS = {
+    name: np.array([weights.get(f, 0.0) for f in FEATURES])
+    for name, weights in PROFILES.items()
+}
+
+
+class PhoneFeatureMatrix:
+    """Normalized feature matrix over a list of phone documents."""
+
+    def __init__(self, phones: list, row=parse_features):
+        self.phones = phones
+        raw = np.vstack([row(p) for p in phones]) if phones else np.empty((0, len(FEATURES)))
+        self.X = normalize(raw)
+
+    def scores(self, priority: str) -> np.ndarray:
+        return self.X @ PROFILE_WEIGHTS[resolve_priority(priority)]
+
+    def top(self, priority: str, n: int, rows=None) -> list:
+        """Indices of the n best phones for a priority (optionally among `rows`)."""
+        scores = self.scores(priority)
+        if rows is not None:
+            rows = np.asarray(rows, dtype=np.int64)
+            order = rows[np.argsort(-scores[rows], kind="stable")]
+        else:
+            order = np.argsort(-scores, kind="stable")
+        return order[:n].tolist()
@@ -0,0 +1,92 @@
+"""
+Precompute a short justification per (phone, priority) for the `phones` catalog.
+
+Blurbs depend only on the phone and the priority, not on the user, so they
+are generated offline (one LLM call per phone covering every priority) and
+stored on the phone document:
+
+    {"blurbs": {"gaming": "...", "camera": "...", "battery": "...", "general": "..."},
+     "blurbs_updated_at": ...}
+
+get_recommendations() then assembles ranked lists from them without an LLM call.
+
+Usage:
+    python -m RecommendationEngine.precompute_blurbs [--force] [--limit N]
+"""
+import argparse
+import json
+import re
+from datetime import datetime, timezone
+
+from pymongo.collection import Collection
+
+from RecommendationEngine.phone_ranker import PROFILES
+from RecommendationEngine.recommendation_service import recommended_collection, format_price
+import llm
+from logs import get_logger
+
+logger = get_logger(__name__)
+
+BLURB_FIELDS = ["chipset", "ram", "storage", "battery_capacity", "main_camera", "selfie_camera",
+                "screen_size", "screen_resolution", "release_year"]
+
+
+def blurb_prompt(phone: dict) -> str:
+    specs = "\n".join(f"- {field}: {phone[field]}" for field in BLURB_FIELDS if phone.get(field))
+    return f"""
+Phone: {phone.get('phone_name', 'Unknown Phone')} ({format_price(phone.get('price_range'))})
+Description: {phone.get('description', 'No description available')}
+{specs}
+
+For each of these buyer priorities: {", ".join(PROFILES)}
+write one or two sentences explaining how well this phone suits that priority.
+Be specific about the relevant specs, professional, no emojis, no markdown.
+
+Answer with a JSON object only, with exactly these keys: {", ".join(PROFILES)}.
+"""
+
+
+def parse_blurbs(text: str) -> dict:
+    # Models sometimes wrap JSON in ``` fences
+    text = re.sub(r"^```(?:json)?|```$", "", text.strip(), flags=re.MULTILINE).strip()
+    data = json.loads(text)
+    return {key: str(data[key]).strip() for key in PROFILES if data.get(key)}
+
+
+def precompute_blurbs(collection: Collection = recommended_collection, force: bool = False, limit: int = 0) -> int:
+    """Generate and store blurbs; returns the number of phones updated."""
+    query = {"price_range": {"$type": "number"}}
+    if not force:
+        query["blurbs"] = {"$exists": False}
+
+    # Read the catalog up front: with one slow LLM call per phone, a live
+    # cursor can time out on the server partway through a large catalog
+    projection = ["phone_name", "price_range", "description", *BLURB_FIELDS]
+    phones = list(collection.find(query, projection).limit(limit))
+
+    updated = 0
+    for phone in phones:
+        try:
+            blurbs = parse_blurbs(llm.generate(blurb_prompt(phone)))
+        except Exception as e:
+            logger.warning("Skipping phone blurbs", extra={"phone": phone.get("phone_name"), "error": str(e)})
+            continue
+
+        collection.update_one(
+            {"_id": phone["_id"]},
+            {"$set": {"blurbs": blurbs, "blurbs_updated_at": datetime.now(timezone.utc)}}
+        )
+        updated += 1
+        logger.info("Blurbs updated", extra={"phone": phone.get("phone_name"), "blurbs": blurbs})
+
+    return updated
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Precompute per-phone recommendation blurbs")
+    parser.add_argument("--force", action="store_true", help="regenerate blurbs that already exist")
+    parser.add_argument("--limit", type=int, default=0, help="maximum number of phones (0 = all)")
+    args = parser.parse_args()
+
+    count = precompute_blurbs(force=args.force, limit=args.limit)
+    print(f"[BLURBS] Updated {count} phones")
@@ -1,25 +1,49 @@
 # recommendation_service.py
 
 from dotenv import load_dotenv
-from pymongo import MongoClient
-from langchain_google_genai import ChatGoogleGenerativeAI
 import os
+from typing import get_args
 from pydantic import BaseModel, Field
+from RecommendationEngine.phone_ranker import SPEC_FIELDS, resolve_priority
+from RecommendationEngine.phone_catalog import PhoneCatalog
+from cache import TTLCache
+from models import RecommendationMode
+import llm
+import metrics
+import mongo
 
 
 load_dotenv()
 
-MONGO_URI = os.getenv("MONGO_CONNECTION_STRING")
-client = MongoClient(MONGO_URI)
-db = client["MobileDB"]
-recommended_collection = db["phones"]
-
-
-model = ChatGoogleGenerativeAI(
-    model="gemini-2.5-flash",
-    api_key=os.getenv("GOOGLE_API_KEY")
+recommended_collection = mongo.collection("phones")
+
+# Candidate retrieval: budget ± PRICE_WINDOW, closest to budget first, at most MAX_CANDIDATES
+PRICE_WINDOW = 5000
+MAX_CANDIDATES = 100
+CANDIDATE_FIELDS = {
+    "phone_name": 1, "description": 1, "price_range": 1, "blurbs": 1,
+    **{field: 1 for field in SPEC_FIELDS if field != "price"},
+}
+
+# Only the locally pre-ranked top phones are sent to the LLM
+TOP_N = 5
+
+# Served from memory; refreshed on change notifications or every CATALOG_REFRESH_SECONDS
+CATALOG_REFRESH_SECONDS = int(os.getenv("PHONE_CATALOG_REFRESH_SECONDS", "300"))
+catalog = PhoneCatalog(
+    recommended_collection,
+    CANDIDATE_FIELDS,
+    refresh_seconds=CATALOG_REFRESH_SECONDS,
+    watch=os.getenv("PHONE_CATALOG_WATCH", "1") == "1",
 )
 
+# Generated text per (budget bucket, priority profile, mode, catalog version)
+BUDGET_BUCKET = 5000
+RECOMMENDATION_CACHE_TTL = int(os.getenv("RECOMMENDATION_CACHE_TTL_SECONDS", "3600"))
+recommendation_cache = TTLCache(maxsize=512, ttl=RECOMMENDATION_CACHE_TTL)
+metrics.register_cache("recommendations", recommendation_cache)
+catalog.add_listener(lambda version: recommendation_cache.invalidate(lambda key: key[-1] != version))
+
 
 class PhoneRecommendationInput(BaseModel):
     max_price: float = Field(description="Maximum price budget for the phone")
@@ -27,17 +51,99 @@ class PhoneRecommendationInput(BaseModel):
 
 
 
-def get_recommendations(max_price: float, priority: str):
+def fetch_candidates(max_price: float, limit: int = MAX_CANDIDATES):
+    """
+    Catalog rows priced within max_price ± PRICE_WINDOW, closest to the
+    budget first. Returns (snapshot, rows) so callers rank against the
+    same snapshot they read from.
+    """
+    snapshot = catalog.snapshot
+    return snapshot, snapshot.closest(max_price, PRICE_WINDOW, limit)
+
+
+def format_price(price) -> str:
+    if isinstance(price, (int, float)):
+        return f"Rs {int(price):,}"
+    return str(price) if price else "Price not available"
+
+
+def phone_blurb(phone: dict, priority: str):
+    """Stored justification for this phone and priority (see precompute_blurbs.py)."""
+    return (phone.get("blurbs") or {}).get(priority)
+
+
+def format_ranked(phones: list, priority: str, max_price: float, use_blurbs: bool = False) -> str:
+    """LLM-free write-up of an already ranked list."""
+    lines = [f"-> Top phones for {priority} around **{format_price(max_price)}**", ""]
+    for idx, phone in enumerate(phones, 1):
+        lines.append(f"{idx}. **{phone.get('phone_name', 'Unknown Phone')}** – **{format_price(phone.get('price_range'))}**")
+        note = (use_blurbs and phone_blurb(phone, priority)) or phone.get("description")
+        if note:
+            lines.append(f"   {note}")
+        lines.append("")
+    return "\n".join(lines).rstrip()
+
+
+def summarize_ranked(phones: list, priority: str, max_price: float) -> str:
+    """One short LLM call introducing an already written-up ranked list."""
+    picks = "\n".join(
+        f"- {phone.get('phone_name', 'Unknown Phone')}: {phone_blurb(phone, priority) or phone.get('description', '')}"
+        for phone in phones
+    )
+    prompt = f"""
+In at most three sentences, introduce these phone picks for a user whose priority is {priority}
+and whose budget is around Rs {int(max_price):,}. Mention the top pick by name.
+Plain text only, no lists, no emojis.
+
+{picks}
+"""
+    return llm.generate(prompt).strip()
+
+
+def budget_bucket(max_price: float) -> int:
+    return int(round(max_price / BUDGET_BUCKET) * BUDGET_BUCKET)
+
+
+def get_recommendations(max_price: float, priority: str, mode: RecommendationMode = "auto"):
     """    Recommend phones under a price limit based on user priority.
+           Candidates are pre-ranked locally, then written up according to mode:
+             "llm"     - the LLM writes up the top phones
+             "blurbs"  - assembled from precomputed per-phone blurbs, no LLM call
+             "summary" - blurbs plus one short LLM introduction
+             "local"   - the ranked list with descriptions, no LLM call
+             "auto"    - "blurbs" when every top phone has one, else "llm"
+           Results are cached per budget bucket, priority and catalog version.
     """
-    phones = list(recommended_collection.find({
-        "price_range": {"$lte": max_price + 5000},
-        "price_range": {"$gte": max_price - 5000}
-    }))
+    if mode not in get_args(RecommendationMode):
+        raise ValueError(f"Unknown recommendation mode: {mode}")
+
+    bucket = budget_bucket(max_price)
+    profile = resolve_priority(priority)
+    key = (bucket, profile, mode, catalog.version)
+
+    return recommendation_cache.get_or_compute(key, lambda: _generate_recommendations(bucket, profile, mode))
 
-    if not phones:
+
+def _generate_recommendations(max_price: float, priority: str, mode: str):
+    snapshot, rows = fetch_candidates(max_price)
+
+    if not rows:
         return {"recommendations": "No phones found in this price range."}
 
+    phones = [snapshot.phones[i] for i in snapshot.matrix.top(priority, TOP_N, rows=rows)]
+
+    if mode == "auto":
+        mode = "blurbs" if all(phone_blurb(p, priority) for p in phones) else "llm"
+
+    if mode == "local":
+        return {"recommendations": format_ranked(phones, priority, max_price)}
+
+    if mode in ("blurbs", "summary"):
+        text = format_ranked(phones, priority, max_price, use_blurbs=True)
+        if mode == "summary":
+            text = f"{summarize_ranked(phones, priority, max_price)}\n\n{text}"
+        return {"recommendations": text}
+
     candidates = []
     for idx, phone in enumerate(phones, 1):
         phone_name = phone.get("phone_name", "Unknown Phone")
@@ -50,11 +156,11 @@ def get_recommendations(max_price: float, priority: str):
 The user wants a phone with priority: {priority}.
 Their budget is around {max_price}.
 
-Here are some candidate phones:
+Here are the best candidate phones, already ranked for this priority:
 {chr(10).join(candidates)}
 
 Instructions:
-1. Rank these phones based on how well they match the user's priority.
+1. Keep this ranking order.
 2. For each ranked phone, explain why it is a good (or not so good) match.
 3. If no phone exactly matches the priority, recommend phones with generally good specs and justify why they are still strong alternatives.
 4. Provide the final ranked list in a clear, user-friendly format.
@@ -80,6 +186,5 @@ Keep explanations concise and structured in short paragraphs.
 """
 
 
-    response = model.invoke(prompt)
-    print("Generated Recommendation Response called")
-    return {"recommendations": response.text}
\ No newline at end of file
+    response = llm.generate(prompt)
+    return {"recommendations": response}
\ No newline at end of file
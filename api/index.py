@@ -1,30 +1,91 @@
-from fastapi import FastAPI, UploadFile, File, Form,HTTPException
+from fastapi import FastAPI, UploadFile, File, Form,HTTPException, Header, Response, Query
 from typing import List, Optional
-from fastapi.responses import FileResponse
+from contextlib import asynccontextmanager
+from fastapi.responses import FileResponse, PlainTextResponse, StreamingResponse
 import requests
+import asyncio
 import os
+import json
 import shutil
+import tempfile
+import time
 import uuid
+from datetime import datetime
 from pydantic import BaseModel
-from urllib.parse import urlparse
-from ReportGenerator.report_generator import generate_damage_report
 
 # --- Import your modules ---
-from models import UsedMobile
-from DamageDetection.Damage_Detection import analyze_phone_images
-from ConditionScoring.condition_scoring import compute_condition_score
-from PricePrediction.predict_price_service import run_pipeline, merge_ai_user_flags
-from RecommendationEngine.recommendation_service import get_recommendations
+import startup
+import metrics
+import mongo
+import profiling
+from logs import get_logger
+from models import UsedMobile, RecommendationMode
 from models import ChatRequest, ChatResponse, ChatHistoryResponse
-from ChatBot.chatbot import generate_reply
-from ChatBot.crud import (
-    create_conversation,
-    get_chat_history,
-    get_chat_history_formatted,
-    save_message
-)
-
-app = FastAPI(title="IntelliFone AI Backend")
+# Drop-in for fastapi's, so threadpool work of profiled requests is profiled too
+from profiling import run_in_threadpool
+
+logger = get_logger(__name__)
+
+# Subsystems are imported on first use, and only by workers serving their role (see startup.py)
+damage = startup.lazy("DamageDetection.Damage_Detection", "damage", "verify")
+reports = startup.lazy("ReportGenerator.report_generator", "damage", "verify")
+scoring = startup.lazy("ConditionScoring.condition_scoring", "damage", "verify")
+pricing = startup.lazy("PricePrediction.predict_price_service", "price", "verify")
+recommendations = startup.lazy("RecommendationEngine.recommendation_service", "recommend", "chat")
+chatbot = startup.lazy("ChatBot.chatbot", "chat")
+chat_crud = startup.lazy("ChatBot.crud", "chat")
+summarizer = startup.lazy("ChatBot.summarizer", "chat")
+
+# Path prefix -> roles serving it; routes of other roles are dropped at the bottom of this file
+ROUTE_ROLES = {
+    "/damage-detection": ("damage",),
+    "/condition-scoring": ("damage",),
+    "/price-prediction": ("price",),
+    "/full-verification": ("verify",),
+    "/recommend": ("recommend",),
+    "/chat": ("chat",),
+}
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if startup.APP_PRELOAD:
+        with startup.step("preload"):
+            startup.preload()
+
+    # One shared pair of Mongo pools (sync + async) for every service
+    with startup.step("mongo"):
+        mongo.manager.open(
+            sync=startup.role_enabled("price", "verify", "recommend", "chat"),
+            use_async=startup.role_enabled("chat"),
+        )
+    app.state.mongo = mongo.manager
+
+    if startup.role_enabled("recommend", "chat"):
+        # Phone catalog is served from memory and refreshed in the background
+        with startup.step("phone_catalog"):
+            recommendations.catalog.start()
+    if startup.role_enabled("chat"):
+        with startup.step("chat_indexes"):
+            await chat_crud.ensure_indexes()
+        if chat_crud.write_buffer is not None:
+            chat_crud.write_buffer.start()
+    startup.log_report()
+    yield
+    if startup.role_enabled("recommend", "chat"):
+        recommendations.catalog.stop()
+    if startup.role_enabled("chat"):
+        # Let summaries being generated finish before the pools close
+        if summarizer.loaded:
+            await summarizer.drain()
+        if chat_crud.write_buffer is not None:
+            await chat_crud.write_buffer.stop()
+    await mongo.manager.close()
+
+
+app = FastAPI(title="IntelliFone AI Backend", lifespan=lifespan)
+app.add_middleware(metrics.RequestMetricsMiddleware)
+if profiling.ENABLED:
+    app.add_middleware(profiling.ProfilingMiddleware)
 
 
 # # ============================================================
@@ -34,84 +95,146 @@ class DamageDetectionRequest(BaseModel):
     image_urls: List[str]  # max 6 URLs
 
 
-@app.post("/damage-detection/")
-async def damage_detection(payload: DamageDetectionRequest):
+# Expected sides (order-based mapping)
+SIDES = ["front", "back", "left", "right", "top", "bottom"]
+MODEL_PATH = os.path.join(os.path.dirname(__file__), "best2.pt")
 
-    if len(payload.image_urls) == 0:
+
+def validate_image_count(count: int):
+    if count == 0:
         raise HTTPException(status_code=400, detail="At least one image URL is required")
 
-    if len(payload.image_urls) > 6:
+    if count > len(SIDES):
         raise HTTPException(status_code=400, detail="Maximum 6 image URLs allowed")
 
-    os.makedirs("uploads", exist_ok=True)
 
-    # Expected sides (order-based mapping)
-    sides = ["front", "back", "left", "right", "top", "bottom"]
+def fetch_image(url: str) -> bytes:
+    response = requests.get(url, timeout=10)
+    response.raise_for_status()
+    return response.content
 
-    saved = {side: None for side in sides}
 
-    # Download images
-    for idx, url in enumerate(payload.image_urls):
+async def download_images(urls: List[str]) -> dict:
+    """Download all images concurrently; returns {side: bytes} in SIDES order."""
+    async def download(idx, url):
         try:
-            response = requests.get(url, timeout=10)
-            response.raise_for_status()
-
-            ext = os.path.splitext(urlparse(url).path)[1] or ".jpg"
-            file_name = f"{uuid.uuid4()}{ext}"
-            file_path = os.path.join("uploads", file_name)
-
-            with open(file_path, "wb") as f:
-                f.write(response.content)
-
-            saved[sides[idx]] = file_path
-
+            return await run_in_threadpool(fetch_image, url)
         except Exception as e:
+            metrics.errors_total.inc(stage="download")
             raise HTTPException(
                 status_code=400,
                 detail=f"Failed to download image at index {idx}: {str(e)}"
             )
 
-    # Run YOLO model
-    model_path = os.path.join(os.path.dirname(__file__), "best2.pt")
-    result = analyze_phone_images(
-        model_path,
-        saved,
-        show_output=False,
-        save_output=True
-    )
-    
-    os.makedirs("reports", exist_ok=True)
+    contents = await asyncio.gather(*(download(idx, url) for idx, url in enumerate(urls)))
+    return dict(zip(SIDES, contents))
 
-    report_path = f"reports/damage_report_{uuid.uuid4()}.pdf"
 
-    generate_damage_report(
-        damages=result["damages"],
-        output_dir="outputs",
-        report_path=report_path
-    )
-    report_path = os.path.abspath(
-    os.path.join("", report_path)
-   )
-    if os.path.exists("outputs"):
-        shutil.rmtree("outputs")
-
-    if os.path.exists("uploads"):
-        shutil.rmtree("uploads")
-    print(f"[REPORT GENERATED] {report_path}")
-    result = compute_condition_score(result)
+# Multipart uploads: per-file limit, read in chunks so oversized files are rejected early
+UPLOAD_MAX_BYTES = int(os.getenv("UPLOAD_MAX_BYTES", str(10 * 1024 * 1024)))
+UPLOAD_CHUNK_BYTES = 64 * 1024
+
+
+async def read_upload(side: str, upload: UploadFile) -> bytes:
+    if upload.size is not None and upload.size > UPLOAD_MAX_BYTES:
+        raise HTTPException(status_code=413, detail=f"Image for side '{side}' exceeds {UPLOAD_MAX_BYTES} bytes")
+
+    data = bytearray()
+    while chunk := await upload.read(UPLOAD_CHUNK_BYTES):
+        data += chunk
+        if len(data) > UPLOAD_MAX_BYTES:
+            raise HTTPException(status_code=413, detail=f"Image for side '{side}' exceeds {UPLOAD_MAX_BYTES} bytes")
+    return bytes(data)
+
+
+async def read_uploads(uploads: dict) -> dict:
+    """{side: UploadFile or None} -> {side: bytes} for the sides that were sent, in SIDES order."""
+    return {
+        side: await read_upload(side, upload)
+        for side, upload in uploads.items()
+        if upload is not None
+    }
+
+
+def validate_uploads(uploads: dict):
+    if not any(upload is not None for upload in uploads.values()):
+        raise HTTPException(status_code=400, detail="At least one image is required")
+
+
+def detect_and_score(images: dict, output_dir: Optional[str] = None, timings: Optional[dict] = None):
+    """
+    Decode in memory, run YOLO and score the condition (blocking; run in the threadpool).
+    Shared by every damage/verification endpoint. Returns (damage_json, scoring).
+    """
+    decoded = {}
+    for side, data in images.items():
+        try:
+            decoded[side] = damage.decode_image(data)
+        except ValueError:
+            metrics.errors_total.inc(stage="decode")
+            raise HTTPException(status_code=400, detail=f"Image for side '{side}' could not be decoded")
+
+    result, _ = damage.detect_damages(MODEL_PATH, decoded, output_dir=output_dir, timings=timings)
+    return result, scoring.compute_condition_score(result)
+
+
+async def damage_report(images: dict) -> dict:
+    """Detection, scoring and PDF report for {side: image bytes}."""
+    # Annotated images live in a per-request directory, so concurrent requests never share files
+    output_dir = tempfile.mkdtemp(prefix="damage_")
+    try:
+        result, scored = await run_in_threadpool(detect_and_score, images, output_dir)
+
+        os.makedirs("reports", exist_ok=True)
+        report_path = os.path.abspath(f"reports/damage_report_{uuid.uuid4()}.pdf")
+        await run_in_threadpool(
+            reports.generate_damage_report,
+            damages=result["damages"],
+            output_dir=output_dir,
+            report_path=report_path
+        )
+    finally:
+        shutil.rmtree(output_dir, ignore_errors=True)
+
+    logger.info("Damage report generated", extra={"report_path": report_path})
     return {
         "pdf_path": report_path,
-        "condition_score": result["condition_score"],
-        "ai_detected": result["ai_detected"]
+        "condition_score": scored["condition_score"],
+        "ai_detected": scored["ai_detected"]
     }
 
 
+@app.post("/damage-detection/")
+async def damage_detection(payload: DamageDetectionRequest):
+    validate_image_count(len(payload.image_urls))
+
+    images = await download_images(payload.image_urls)
+    return await damage_report(images)
+
+
+# Same detection, scoring and report as above, with the images sent as multipart files
+@app.post("/damage-detection/upload")
+async def damage_detection_upload(
+    front: Optional[UploadFile] = File(None),
+    back: Optional[UploadFile] = File(None),
+    left: Optional[UploadFile] = File(None),
+    right: Optional[UploadFile] = File(None),
+    top: Optional[UploadFile] = File(None),
+    bottom: Optional[UploadFile] = File(None),
+):
+    uploads = {"front": front, "back": back, "left": left, "right": right, "top": top, "bottom": bottom}
+    validate_uploads(uploads)
+
+    images = await read_uploads(uploads)
+    return await damage_report(images)
+
+
 # ============================================================
 #  ENDPOINT 2 — CONDITION SCORING
 # ============================================================
 @app.post("/condition-scoring/")
 async def condition_scoring(damage_json: dict):
-    result = compute_condition_score(damage_json)
+    result = scoring.compute_condition_score(damage_json)
     return result
 
 
@@ -121,6 +244,7 @@ async def condition_scoring(damage_json: dict):
 # # ============================================================
 @app.post("/price-prediction/")
 async def price_prediction(
+    response: Response,
     brand: Optional[str] = Form(None),
     model: Optional[str] = Form(None),
     ram: Optional[str] = Form(None),
@@ -139,7 +263,10 @@ async def price_prediction(
 
     ai_screen_crack: bool = Form(False),
     ai_panel_dot: bool = Form(False),
-    ai_panel_line: bool = Form(False)
+    ai_panel_line: bool = Form(False),
+
+    # Send "X-Debug-Timings: 1" to get per-stage timings back in Server-Timing
+    x_debug_timings: Optional[str] = Header(None)
 ):
     ai_flags = {
         "screen_crack": ai_screen_crack,
@@ -164,7 +291,12 @@ async def price_prediction(
         pta_approved=pta_approved
     )
 
-    price_range = run_pipeline(mobile, ai_flags)
+    # Run off the event loop so identical concurrent requests can share one computation
+    timings = {}
+    price_range = await run_in_threadpool(pricing.run_pipeline, mobile, ai_flags, timings=timings)
+
+    if x_debug_timings:
+        response.headers["Server-Timing"] = metrics.server_timing_header(timings)
 
     return price_range
 
@@ -173,99 +305,137 @@ async def price_prediction(
 # # ============================================================
 # #  ENDPOINT 4 — FULL VERIFICATION PIPELINE
 # # ============================================================
-# @app.post("/full-verification/")
-# async def full_verification(
-#     brand: str = Form(...),
-#     model: str = Form(...),
-#     ram: str = Form(...),
-#     storage: str = Form(...),
-
-#     # User fallback inputs
-#     is_panel_changed: bool = Form(False),
-#     screen_crack: bool = Form(False),
-#     panel_dot: bool = Form(False),
-#     panel_line: bool = Form(False),
-#     panel_shade: bool = Form(False),
-#     camera_lens_ok: bool = Form(True),
-#     fingerprint_ok: bool = Form(True),
-#     pta_approved: bool = Form(True),
-
-#     # Images
-#     front: Optional[UploadFile] = File(None),
-#     back: Optional[UploadFile] = File(None),
-#     left: Optional[UploadFile] = File(None),
-#     right: Optional[UploadFile] = File(None),
-#     top: Optional[UploadFile] = File(None),
-#     bottom: Optional[UploadFile] = File(None),
-# ):
-#     # -------------------------------
-#     # Save images
-#     # -------------------------------
-#     uploads = {}
-#     os.makedirs("uploads", exist_ok=True)
-
-#     for side, img in {
-#         "front": front, "back": back, "left": left,
-#         "right": right, "top": top, "bottom": bottom
-#     }.items():
-#         if img:
-#             file_id = f"{uuid.uuid4()}.jpg"
-#             file_path = f"uploads/{file_id}"
-#             with open(file_path, "wb") as f:
-#                 shutil.copyfileobj(img.file, f)
-#             uploads[side] = file_path
-#         else:
-#             uploads[side] = None
-
-#     # -------------------------------
-#     # Run YOLO Damage Detection
-#     # -------------------------------
-#     model_path = os.path.join(os.path.dirname(__file__), "best2.pt")
-#     damage_result = analyze_phone_images(model_path, uploads, show_output=False, save_output=False)
-
-#     # -------------------------------
-#     # Condition Scoring
-#     # -------------------------------
-#     scoring = compute_condition_score(damage_result)
-#     ai_flags = scoring["ai_detected"]
-#     condition_score = scoring["condition_score"]
-
-#     # -------------------------------
-#     # Build UsedMobile object
-#     # -------------------------------
-#     mobile = UsedMobile(
-#         brand=brand,
-#         model=model,
-#         ram=ram,
-#         storage=storage,
-#         condition_score=condition_score,
-#         is_panel_changed=is_panel_changed,
-#         screen_crack=screen_crack,
-#         panel_dot=panel_dot,
-#         panel_line=panel_line,
-#         panel_shade=panel_shade,
-#         camera_lens_ok=camera_lens_ok,
-#         fingerprint_ok=fingerprint_ok,
-#         pta_approved=pta_approved,
-#         images=list(uploads.values())
-#     )
-
-#     # -------------------------------
-#     # Price Prediction
-#     # -------------------------------
-#     price_range = run_pipeline(mobile, ai_flags)
-
-#     # -------------------------------
-#     # Final Output
-#     # -------------------------------
-#     return {
-#         "damage_detection": damage_result,
-#         "condition_score": condition_score,
-#         "ai_flags": ai_flags,
-#         "price_range": price_range,
-#         "mobile_info": mobile.model_dump(),
-#         "uploaded_images": uploads
-#     }
+class FullVerificationRequest(BaseModel):
+    brand: str
+    model: str
+    ram: str
+    storage: str
+    image_urls: List[str]  # max 6 URLs, same side order as /damage-detection/
+
+    # User fallback inputs
+    is_panel_changed: bool = False
+    screen_crack: bool = False
+    panel_dot: bool = False
+    panel_line: bool = False
+    panel_shade: bool = False
+    camera_lens_ok: bool = True
+    fingerprint_ok: bool = True
+    pta_approved: bool = True
+
+
+async def run_full_verification(mobile: UsedMobile, images) -> dict:
+    """
+    detect → score → price in one request, with the independent work overlapped:
+    the price table / model for brand+model is fetched (or trained) in the
+    threadpool while `images` (an awaitable of {side: bytes}) resolves and YOLO
+    runs. Only the condition score and AI flags join the price stage at the end.
+    Stage timings (ms) are returned alongside the result.
+    """
+    timings = {}
+    started = time.perf_counter()
+
+    async def timed(name, awaitable):
+        start = time.perf_counter()
+        try:
+            return await awaitable
+        finally:
+            timings[name] = time.perf_counter() - start
+
+    prefetch = asyncio.create_task(timed("price_prefetch", run_in_threadpool(pricing.prefetch_price_model, mobile)))
+    try:
+        side_images = await timed("images", images)
+        damage_result, scored = await timed(
+            "detection", run_in_threadpool(detect_and_score, side_images, None, timings)
+        )
+    except BaseException:
+        # The prefetch keeps warming the cache; just don't leave its outcome unretrieved
+        prefetch.add_done_callback(lambda task: task.cancelled() or task.exception())
+        raise
+
+    ai_flags = scored["ai_detected"]
+    condition_score = scored["condition_score"]
+    mobile = mobile.model_copy(update={"condition_score": condition_score})
+
+    # Prefetch failures (e.g. too few listings) surface again from run_pipeline below
+    wait_start = time.perf_counter()
+    try:
+        await prefetch
+    except Exception:
+        pass
+    timings["price_prefetch_wait"] = time.perf_counter() - wait_start
+
+    price_stages = {}
+    price_range = await timed(
+        "price", run_in_threadpool(pricing.run_pipeline, mobile, ai_flags, timings=price_stages)
+    )
+    timings["total"] = time.perf_counter() - started
+
+    return {
+        "damage_detection": damage_result,
+        "condition_score": condition_score,
+        "ai_flags": ai_flags,
+        "price_range": price_range,
+        "mobile_info": mobile.model_dump(exclude_none=True),
+        "timings_ms": {
+            **{name: round(seconds * 1000, 1) for name, seconds in timings.items()},
+            **{f"price_{name}": round(value * 1000, 1) if isinstance(value, float) else value
+               for name, value in price_stages.items()},
+        },
+    }
+
+
+@app.post("/full-verification/")
+async def full_verification(payload: FullVerificationRequest):
+    validate_image_count(len(payload.image_urls))
+
+    mobile = UsedMobile(**payload.model_dump(exclude={"image_urls"}), images=payload.image_urls)
+    return await run_full_verification(mobile, download_images(payload.image_urls))
+
+
+@app.post("/full-verification/upload")
+async def full_verification_upload(
+    brand: str = Form(...),
+    model: str = Form(...),
+    ram: str = Form(...),
+    storage: str = Form(...),
+
+    # User fallback inputs
+    is_panel_changed: bool = Form(False),
+    screen_crack: bool = Form(False),
+    panel_dot: bool = Form(False),
+    panel_line: bool = Form(False),
+    panel_shade: bool = Form(False),
+    camera_lens_ok: bool = Form(True),
+    fingerprint_ok: bool = Form(True),
+    pta_approved: bool = Form(True),
+
+    # Images
+    front: Optional[UploadFile] = File(None),
+    back: Optional[UploadFile] = File(None),
+    left: Optional[UploadFile] = File(None),
+    right: Optional[UploadFile] = File(None),
+    top: Optional[UploadFile] = File(None),
+    bottom: Optional[UploadFile] = File(None),
+):
+    uploads = {"front": front, "back": back, "left": left, "right": right, "top": top, "bottom": bottom}
+    validate_uploads(uploads)
+
+    mobile = UsedMobile(
+        brand=brand,
+        model=model,
+        ram=ram,
+        storage=storage,
+        is_panel_changed=is_panel_changed,
+        screen_crack=screen_crack,
+        panel_dot=panel_dot,
+        panel_line=panel_line,
+        panel_shade=panel_shade,
+        camera_lens_ok=camera_lens_ok,
+        fingerprint_ok=fingerprint_ok,
+        pta_approved=pta_approved,
+        images=[upload.filename for upload in uploads.values() if upload is not None]
+    )
+    return await run_full_verification(mobile, read_uploads(uploads))
 
 
 
@@ -273,33 +443,132 @@ async def price_prediction(
 #  ENDPOINT 5 — PHONE RECOMMENDATIONS
 # ============================================================
 @app.get("/recommend/")
-async def recommend_phones(max_price: float, priority: str):
-    return get_recommendations(max_price, priority)
+async def recommend_phones(max_price: float, priority: str, mode: RecommendationMode = "auto"):
+    return await run_in_threadpool(recommendations.get_recommendations, max_price, priority, mode=mode)
 # ============================================================
 #  ENDPOINT 6 — CHATBOT INTERFACE
 @app.post("/chat", response_model=ChatResponse)
 async def chat(req: ChatRequest):
+    received_at = datetime.utcnow()
     conversation_id = req.conversation_id
 
     if not conversation_id:
-        conversation_id = create_conversation(
+        conversation_id = await chat_crud.create_conversation(
             req.user_id, req.message
         )
 
-    history = get_chat_history(conversation_id)
+    history = await chat_crud.get_chat_history(conversation_id, limit=summarizer.CHAT_RECENT_MESSAGES)
+    summary = (await chat_crud.get_conversation_summary(conversation_id))["summary"]
 
-    reply = generate_reply(history, req.message)
+    reply = await chatbot.generate_reply(history, req.message, summary)
 
-    save_message(conversation_id, req.user_id, "user", req.message)
-    save_message(conversation_id, req.user_id, "assistant", reply)
+    await chat_crud.save_turn(conversation_id, req.user_id, req.message, reply, user_at=received_at)
+    summarizer.schedule_summary_update(conversation_id)
 
     return {
         "conversation_id": conversation_id,
         "reply": reply
     }
 # ============================================================
+#  ENDPOINT 6b — CHATBOT INTERFACE (server-sent events)
+def sse_event(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+@app.post("/chat/stream")
+async def chat_stream(req: ChatRequest):
+    """
+    Streams the reply as it is generated:
+      event: start  {"conversation_id"}
+      event: token  {"text"}            (repeated)
+      event: done   {"conversation_id", "reply"}  after the turn is saved
+      event: error  {"detail"}
+    """
+    received_at = datetime.utcnow()
+    conversation_id = req.conversation_id
+
+    if not conversation_id:
+        conversation_id = await chat_crud.create_conversation(
+            req.user_id, req.message
+        )
+
+    history = await chat_crud.get_chat_history(conversation_id, limit=summarizer.CHAT_RECENT_MESSAGES)
+    summary = (await chat_crud.get_conversation_summary(conversation_id))["summary"]
+
+    async def events():
+        yield sse_event("start", {"conversation_id": conversation_id})
+
+        parts = []
+        try:
+            async for chunk in chatbot.stream_reply(history, req.message, summary):
+                parts.append(chunk)
+                yield sse_event("token", {"text": chunk})
+        except Exception as e:
+            yield sse_event("error", {"detail": str(e)})
+            return
+
+        reply = "".join(parts)
+        await chat_crud.save_turn(conversation_id, req.user_id, req.message, reply, user_at=received_at)
+        summarizer.schedule_summary_update(conversation_id)
+
+        yield sse_event("done", {"conversation_id": conversation_id, "reply": reply})
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+# ============================================================
 #  ENDPOINT 7 — get all messages in a conversation
 @app.get("/chat/{conversation_id}", response_model=ChatHistoryResponse)
-async def get_chat(conversation_id: str):
-    history = get_chat_history_formatted(conversation_id)
+async def get_chat(
+    conversation_id: str,
+    before: Optional[str] = None,
+    after: Optional[str] = None,
+    limit: int = Query(50, ge=1, le=200)
+):
+    if before and after:
+        raise HTTPException(status_code=400, detail="Use either before or after, not both")
+
+    try:
+        history = await chat_crud.get_chat_history_formatted(conversation_id, before=before, after=after, limit=limit)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     return history
+
+
+# Full export as newline-delimited JSON, streamed straight from the cursor
+@app.get("/chat/{conversation_id}/export")
+async def export_chat(conversation_id: str):
+    async def lines():
+        async for message in chat_crud.iter_chat_messages(conversation_id):
+            yield json.dumps(message) + "\n"
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+
+# ============================================================
+#  METRICS — Prometheus text format
+@app.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics():
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+
+# ============================================================
+#  PROFILES — opt-in per-request profiles (see profiling.py)
+# ============================================================
+@app.get("/profiles/{profile_id}", response_class=PlainTextResponse)
+async def get_profile(
+    profile_id: str,
+    sort: str = Query("cumulative"),
+    limit: int = Query(50, ge=1, le=500),
+):
+    if sort not in profiling.SORT_KEYS:
+        raise HTTPException(status_code=400, detail=f"sort must be one of {', '.join(profiling.SORT_KEYS)}")
+    profile = profiling.get_profile(profile_id)
+    if profile is None:
+        raise HTTPException(status_code=404, detail="Profile not found or expired")
+    return PlainTextResponse(await run_in_threadpool(profile.render, sort, limit))
+
+
+startup.prune_routes(app, ROUTE_ROLES)
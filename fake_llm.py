@@ -0,0 +1,100 @@
+"""
+Deterministic offline stand-in for the Gemini chat model.
+
+Selected with LLM_PROVIDER=fake. It implements the calls llm.py makes
+(invoke, ainvoke, astream) and returns LangChain message objects, so the
+rest of the application runs unchanged while load tests measure its own
+overhead instead of Gemini's.
+
+The reply to a prompt is always the same text (derived from a hash of the
+prompt), and timing and failures are configurable:
+
+    FAKE_LLM_LATENCY_SECONDS    time to first token (default 0.5)
+    FAKE_LLM_TOKENS_PER_SECOND  generation speed after the first token (default 50)
+    FAKE_LLM_REPLY_TOKENS       words per reply (default 120)
+    FAKE_LLM_FAILURE_RATE       fraction of calls that raise FakeLLMError (default 0)
+    FAKE_LLM_SEED               seed for the failure sequence (default 0)
+"""
+import asyncio
+import hashlib
+import os
+import random
+import threading
+import time
+
+from langchain_core.messages import AIMessage, AIMessageChunk
+
+VOCABULARY = (
+    "phone battery camera display chipset performance storage price value **Rs** "
+    "screen design charging gaming photos video software updates build quality "
+    "the a is with and for good great solid reliable fast smooth bright long-lasting "
+    "overall daily use users budget option choice recommended offers delivers"
+).split()
+
+
+class FakeLLMError(RuntimeError):
+    """Injected failure, standing in for a provider/API error."""
+
+
+def _prompt_text(messages) -> str:
+    if isinstance(messages, str):
+        return messages
+    return "\n".join(str(getattr(m, "content", m)) for m in messages)
+
+
+class FakeChatModel:
+    def __init__(self, latency: float = 0.5, tokens_per_second: float = 50, reply_tokens: int = 120,
+                 failure_rate: float = 0.0, seed: int = 0):
+        self.latency = latency
+        self.tokens_per_second = tokens_per_second
+        self.reply_tokens = reply_tokens
+        self.failure_rate = failure_rate
+        self._failures = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def reply_words(self, messages) -> list:
+        """The deterministic reply to these messages, as words."""
+        digest = hashlib.sha256(_prompt_text(messages).encode()).digest()
+        rng = random.Random(digest)
+        return [rng.choice(VOCABULARY) for _ in range(self.reply_tokens)]
+
+    def _maybe_fail(self):
+        with self._lock:
+            failed = self._failures.random() < self.failure_rate
+        if failed:
+            raise FakeLLMError("Injected fake LLM failure")
+
+    @property
+    def _token_delay(self) -> float:
+        return 1 / self.tokens_per_second if self.tokens_per_second > 0 else 0.0
+
+    def invoke(self, messages, **kwargs) -> AIMessage:
+        words = self.reply_words(messages)
+        time.sleep(self.latency + len(words) * self._token_delay)
+        self._maybe_fail()
+        return AIMessage(content=" ".join(words))
+
+    async def ainvoke(self, messages, **kwargs) -> AIMessage:
+        words = self.reply_words(messages)
+        await asyncio.sleep(self.latency + len(words) * self._token_delay)
+        self._maybe_fail()
+        return AIMessage(content=" ".join(words))
+
+    async def astream(self, messages, **kwargs):
+        words = self.reply_words(messages)
+        await asyncio.sleep(self.latency)
+        self._maybe_fail()
+        for i, word in enumerate(words):
+            if i:
+                await asyncio.sleep(self._token_delay)
+            yield AIMessageChunk(content=word if i == 0 else " " + word)
+
+
+def from_env() -> FakeChatModel:
+    return FakeChatModel(
+        latency=float(os.getenv("FAKE_LLM_LATENCY_SECONDS", "0.5")),
+        tokens_per_second=float(os.getenv("FAKE_LLM_TOKENS_PER_SECOND", "50")),
+        reply_tokens=int(os.getenv("FAKE_LLM_REPLY_TOKENS", "120")),
+        failure_rate=float(os.getenv("FAKE_LLM_FAILURE_RATE", "0")),
+        seed=int(os.getenv("FAKE_LLM_SEED", "0")),
+    )
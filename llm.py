@@ -0,0 +1,135 @@
+import asyncio
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from dotenv import load_dotenv
+
+import metrics
+
+load_dotenv()
+
+# "gemini", or "fake" for the offline stand-in used in load tests (see fake_llm.py)
+LLM_PROVIDER = os.getenv("LLM_PROVIDER", "gemini")
+LLM_MODEL = os.getenv("LLM_MODEL", "gemini-2.5-flash")
+LLM_TEMPERATURE = float(os.getenv("LLM_TEMPERATURE", "0.3"))
+LLM_TIMEOUT_SECONDS = float(os.getenv("LLM_TIMEOUT_SECONDS", "60"))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "2"))
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "8"))
+
+_client = None
+_client_lock = threading.Lock()
+
+# Separate limits for async callers (event loop) and sync callers (threadpool, batch jobs)
+_async_slots = asyncio.Semaphore(LLM_MAX_CONCURRENCY)
+_sync_slots = threading.BoundedSemaphore(LLM_MAX_CONCURRENCY)
+
+
+def _gemini():
+    from langchain_google_genai import ChatGoogleGenerativeAI
+
+    return ChatGoogleGenerativeAI(
+        model=LLM_MODEL,
+        temperature=LLM_TEMPERATURE,
+        google_api_key=os.getenv("GOOGLE_API_KEY"),
+        timeout=LLM_TIMEOUT_SECONDS,
+        max_retries=LLM_MAX_RETRIES,
+    )
+
+
+def _fake():
+    import fake_llm
+
+    return fake_llm.from_env()
+
+
+# Provider name -> factory for a chat model with invoke / ainvoke / astream
+PROVIDERS = {
+    "gemini": _gemini,
+    "fake": _fake,
+}
+
+
+def get_llm():
+    """The process-wide chat model for LLM_PROVIDER, created on first use and reused for every call."""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                if LLM_PROVIDER not in PROVIDERS:
+                    raise ValueError(f"Unknown LLM_PROVIDER {LLM_PROVIDER!r}; expected one of {sorted(PROVIDERS)}")
+                _client = PROVIDERS[LLM_PROVIDER]()
+    return _client
+
+
+def message_text(message) -> str:
+    content = message.content
+    if isinstance(content, str):
+        return content
+    # Multimodal responses come back as a list of parts
+    return "".join(part.get("text", "") if isinstance(part, dict) else str(part) for part in content)
+
+
+@contextmanager
+def _observed(call: str):
+    """Record provider latency (excluding the wait for a concurrency slot) and failures."""
+    start = time.perf_counter()
+    outcome = "ok"
+    try:
+        yield
+    except asyncio.TimeoutError:
+        outcome = "timeout"
+        metrics.errors_total.inc(stage="llm")
+        raise
+    except Exception:
+        outcome = "error"
+        metrics.errors_total.inc(stage="llm")
+        raise
+    except BaseException:
+        outcome = "cancelled"   # e.g. the client went away mid-stream
+        raise
+    finally:
+        metrics.llm_call_seconds.observe(
+            time.perf_counter() - start, provider=LLM_PROVIDER, call=call, outcome=outcome
+        )
+
+
+async def agenerate(messages, timeout: float = None) -> str:
+    """Async LLM call bounded by LLM_MAX_CONCURRENCY and a per-call timeout."""
+    async with _async_slots:
+        with _observed("agenerate"):
+            response = await asyncio.wait_for(
+                get_llm().ainvoke(messages),
+                timeout=timeout or LLM_TIMEOUT_SECONDS,
+            )
+    return message_text(response)
+
+
+async def astream(messages, timeout: float = None):
+    """Yield response text chunks as they are generated, within an overall timeout."""
+    deadline = time.monotonic() + (timeout or LLM_TIMEOUT_SECONDS)
+    async with _async_slots:
+        with _observed("astream"):
+            start = time.perf_counter()
+            first = True
+            chunks = get_llm().astream(messages).__aiter__()
+            while True:
+                try:
+                    chunk = await asyncio.wait_for(chunks.__anext__(), timeout=deadline - time.monotonic())
+                except StopAsyncIteration:
+                    break
+                if first:
+                    metrics.llm_first_token_seconds.observe(time.perf_counter() - start, provider=LLM_PROVIDER)
+                    first = False
+                text = message_text(chunk)
+                if text:
+                    yield text
+
+
+def generate(messages) -> str:
+    """Blocking LLM call for threadpool code and batch jobs."""
+    with _sync_slots:
+        with _observed("generate"):
+            response = get_llm().invoke(messages)
+    return message_text(response)
@@ -0,0 +1,74 @@
+"""
+Structured logging for the API and batch jobs.
+
+    from logs import get_logger
+    logger = get_logger(__name__)
+    logger.info("Report generated", extra={"report_path": path})
+
+With LOG_FORMAT=json (the default) every record is one JSON object per
+line: timestamp, level, logger, message, any `extra` fields and the
+exception, if any. LOG_FORMAT=text gives a plain format for local runs.
+LOG_LEVEL sets the root level (default INFO); the chatty third-party
+libraries in QUIET_LOGGERS (one INFO line per outbound request or
+inference) only log warnings and errors.
+"""
+import json
+import logging
+import os
+import sys
+from datetime import datetime, timezone
+
+LOG_FORMAT = os.getenv("LOG_FORMAT", "json")
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+
+QUIET_LOGGERS = (
+    "httpx", "httpx2", "httpcore", "urllib3", "langchain", "langchain_core", "langchain_google_genai",
+    "google", "ultralytics", "pymongo", "PIL", "matplotlib",
+)
+
+# Attributes every LogRecord has; anything else was passed via `extra`
+_RECORD_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime", "taskName"}
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname.lower(),
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRS and not key.startswith("_"):
+                entry[key] = value
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+_configured = False
+
+
+def configure():
+    """Install the handler on the root logger once per process."""
+    global _configured
+    if _configured:
+        return
+    _configured = True
+
+    handler = logging.StreamHandler(sys.stdout)
+    if LOG_FORMAT == "json":
+        handler.setFormatter(JsonFormatter())
+    else:
+        handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+
+    root = logging.getLogger()
+    root.addHandler(handler)
+    root.setLevel(LOG_LEVEL)
+    for name in QUIET_LOGGERS:
+        logging.getLogger(name).setLevel(logging.WARNING)
+
+
+def get_logger(name: str) -> logging.Logger:
+    configure()
+    return logging.getLogger(name)
@@ -0,0 +1,267 @@
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+# Default latency buckets (seconds)
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+_registry = {}
+_registry_lock = threading.Lock()
+
+# Per-request stage timings ({stage: seconds}), set by whoever wants them reported
+current_timings: ContextVar = ContextVar("current_timings", default=None)
+
+
+def _label_str(labels: tuple) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{v}"' for k, v in labels) + "}"
+
+
+class Histogram:
+    """Cumulative-bucket histogram, one series per label set."""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, doc: str, buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.doc = doc
+        self.buckets = tuple(buckets)
+        self._series = {}   # labels -> [bucket counts..., count, sum]
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels):
+        key = tuple(sorted(labels.items()))
+        idx = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0] * (len(self.buckets) + 2)
+            for i in range(idx, len(self.buckets)):
+                series[i] += 1
+            series[-2] += 1
+            series[-1] += value
+
+    def render(self):
+        lines = []
+        with self._lock:
+            for key, series in sorted(self._series.items()):
+                for bound, count in zip(self.buckets, series):
+                    lines.append(f"{self.name}_bucket{_label_str(key + (('le', bound),))} {count}")
+                lines.append(f"{self.name}_bucket{_label_str(key + (('le', '+Inf'),))} {series[-2]}")
+                lines.append(f"{self.name}_count{_label_str(key)} {series[-2]}")
+                lines.append(f"{self.name}_sum{_label_str(key)} {series[-1]}")
+        return lines
+
+
+class Counter:
+    """Monotonic counter, one series per label set."""
+
+    kind = "counter"
+
+    def __init__(self, name: str, doc: str):
+        self.name = name
+        self.doc = doc
+        self._series = {}   # labels -> value
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            self._series[key] = self._series.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        return self._series.get(tuple(sorted(labels.items())), 0)
+
+    def render(self):
+        with self._lock:
+            return [f"{self.name}{_label_str(key)} {value}" for key, value in sorted(self._series.items())]
+
+
+class Gauge(Counter):
+    """Value that can go up and down, one series per label set."""
+
+    kind = "gauge"
+
+    def set(self, value: float, **labels):
+        with self._lock:
+            self._series[tuple(sorted(labels.items()))] = value
+
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+
+
+class CacheStats:
+    """Hits, misses and size of registered caches (TTLCache and friends), read at scrape time."""
+
+    def __init__(self, name: str = "cache"):
+        self.name = name
+        self._caches = {}
+
+    def register(self, cache_name: str, cache):
+        self._caches[cache_name] = cache
+
+    def families(self):
+        caches = sorted(self._caches.items())
+        yield ("cache_hits_total", "Cache hits", "counter",
+               [f'cache_hits_total{{cache="{name}"}} {cache.hits}' for name, cache in caches])
+        yield ("cache_misses_total", "Cache misses", "counter",
+               [f'cache_misses_total{{cache="{name}"}} {cache.misses}' for name, cache in caches])
+        yield ("cache_entries", "Entries currently cached", "gauge",
+               [f'cache_entries{{cache="{name}"}} {len(cache)}' for name, cache in caches])
+
+
+def _register(cls, name: str, *args):
+    with _registry_lock:
+        metric = _registry.get(name)
+        if metric is None:
+            metric = _registry[name] = cls(name, *args)
+        return metric
+
+
+def histogram(name: str, doc: str, buckets=LATENCY_BUCKETS) -> Histogram:
+    """Get or create a registered histogram."""
+    return _register(Histogram, name, doc, buckets)
+
+
+def counter(name: str, doc: str) -> Counter:
+    """Get or create a registered counter."""
+    return _register(Counter, name, doc)
+
+
+def gauge(name: str, doc: str) -> Gauge:
+    """Get or create a registered gauge."""
+    return _register(Gauge, name, doc)
+
+
+@contextmanager
+def timer(metric: Histogram, **labels):
+    """Observe the duration of the block in `metric`."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        metric.observe(time.perf_counter() - start, **labels)
+
+
+def register_cache(name: str, cache):
+    """Export a cache's hits, misses and size on /metrics."""
+    _register(CacheStats, "cache").register(name, cache)
+
+
+# ------------------------------------------------------------
+#  HTTP and errors
+# ------------------------------------------------------------
+http_request_seconds = histogram(
+    "http_request_duration_seconds", "Request latency by method, route and status (until the body is sent)")
+http_requests_in_flight = gauge("http_requests_in_flight", "Requests currently being handled, by method")
+errors_total = counter("app_errors_total", "Errors by stage")
+
+
+class RequestMetricsMiddleware:
+    """
+    ASGI middleware recording latency and errors per route template, and in-flight
+    requests. Streaming responses are timed until their last chunk. The route is
+    read from scope["route"], which the router sets on the shared scope when a
+    route matches, so routing is not repeated here.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        method = scope["method"]
+        status = 500
+        start = time.perf_counter()
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        http_requests_in_flight.inc(method=method)
+        try:
+            await self.app(scope, receive, send_wrapper)
+        except Exception:
+            errors_total.inc(stage="http")
+            raise
+        finally:
+            http_requests_in_flight.dec(method=method)
+            route = getattr(scope.get("route"), "path", "unmatched")
+            http_request_seconds.observe(time.perf_counter() - start, method=method, route=route, status=status)
+
+
+# ------------------------------------------------------------
+#  Damage detection, LLM, Mongo
+# ------------------------------------------------------------
+yolo_inference_seconds = histogram("yolo_inference_seconds", "YOLO inference time per phone side")
+llm_call_seconds = histogram("llm_call_seconds", "LLM call latency by provider, call and outcome")
+llm_first_token_seconds = histogram("llm_first_token_seconds", "Time to the first streamed LLM chunk")
+mongo_command_seconds = histogram(
+    "mongo_command_seconds", "Mongo command latency by client, command and outcome",
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 5.0))
+
+
+# ------------------------------------------------------------
+#  Price pipeline
+# ------------------------------------------------------------
+pipeline_stage_seconds = histogram(
+    "price_pipeline_stage_seconds", "Time spent in each run_pipeline stage")
+pipeline_training_rows = histogram(
+    "price_pipeline_training_rows", "Listings used per training run",
+    buckets=(15, 50, 100, 250, 500, 1000, 2500, 5000, 10000))
+pipeline_training_seconds = histogram(
+    "price_model_training_seconds", "Forest fitting time by kind (full, incremental)")
+pipeline_model_nodes = histogram(
+    "price_pipeline_model_nodes", "Total tree nodes of freshly trained forests",
+    buckets=(1e3, 5e3, 1e4, 5e4, 1e5, 5e5, 1e6))
+
+
+def record_stage(stage: str, seconds: float):
+    """Observe a pipeline stage and add it to the current request's timings."""
+    pipeline_stage_seconds.observe(seconds, stage=stage)
+    timings = current_timings.get()
+    if timings is not None:
+        timings[stage] = timings.get(stage, 0.0) + seconds
+
+
+@contextmanager
+def stage(name: str):
+    start = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        errors_total.inc(stage=name)
+        raise
+    finally:
+        record_stage(name, time.perf_counter() - start)
+
+
+def server_timing_header(timings: dict) -> str:
+    """Format stage timings as a Server-Timing header value (milliseconds)."""
+    return ", ".join(
+        f"{name};dur={value * 1000:.1f}" if isinstance(value, float) else f"{name};desc={value}"
+        for name, value in timings.items()
+    )
+
+
+def render() -> str:
+    """All registered metrics in Prometheus text exposition format."""
+    lines = []
+    with _registry_lock:
+        metrics = list(_registry.values())
+    for metric in metrics:
+        families = metric.families() if hasattr(metric, "families") else [
+            (metric.name, metric.doc, metric.kind, metric.render())
+        ]
+        for name, doc, kind, samples in families:
+            lines.append(f"# HELP {name} {doc}")
+            lines.append(f"# TYPE {name} {kind}")
+            lines.extend(samples)
+    return "\n".join(lines) + "\n"
@@ -2,6 +2,10 @@ from pydantic import BaseModel
 from typing import Optional
 import typing
 from typing import List
+from typing import Literal
+
+# How /recommend/ writes up the ranked phones (see recommendation_service.get_recommendations)
+RecommendationMode = Literal["auto", "llm", "blurbs", "summary", "local"]
 
 class UsedMobile(BaseModel):
     brand: Optional[str] = None
@@ -77,9 +81,12 @@ class ChatResponse(BaseModel):
     conversation_id: str
     reply: str
 class ChatMessage(BaseModel):
+    id: Optional[str] = None
     role: str  # "user" or "assistant"
     content: str
 
 class ChatHistoryResponse(BaseModel):
     conversation_id: str
-    messages: List[ChatMessage]
\ No newline at end of file
+    messages: List[ChatMessage]
+    has_more: bool = False
+    next_cursor: Optional[str] = None  # pass as before/after to get the next page
\ No newline at end of file
@@ -0,0 +1,264 @@
+"""
+Shared MongoDB connections for the whole process.
+
+One MongoManager owns a sync MongoClient (price pipeline, recommendation
+catalog, batch jobs) and an AsyncMongoClient (chat). Both are opened in the
+FastAPI lifespan (or lazily on first use, e.g. in CLI scripts) and closed
+on shutdown, so each worker has exactly two pools with tunable sizes,
+timeouts and read preferences:
+
+    MONGO_MAX_POOL_SIZE / MONGO_MIN_POOL_SIZE / MONGO_TIMEOUT_MS / MONGO_READ_PREFERENCE
+    CHAT_DB_MAX_POOL_SIZE / CHAT_DB_MIN_POOL_SIZE / CHAT_DB_TIMEOUT_MS / CHAT_DB_READ_PREFERENCE
+    MONGO_SERVER_SELECTION_TIMEOUT_MS, MONGO_MAX_IDLE_TIME_MS (both clients)
+
+Services hold collection() handles, which resolve against the current
+client on use. Pool utilization (open, in-use and waiting connections,
+checkout wait times and failures) and per-command latency are reported
+on /metrics.
+"""
+import os
+import threading
+from dataclasses import dataclass
+from typing import Optional
+
+from dotenv import load_dotenv
+from pymongo import AsyncMongoClient, MongoClient
+from pymongo.monitoring import CommandListener, ConnectionPoolListener
+
+import metrics
+
+load_dotenv()
+
+MONGO_URI = os.getenv("MONGO_CONNECTION_STRING")
+DB_NAME = "MobileDB"
+
+
+def _optional_int(name: str) -> Optional[int]:
+    value = os.getenv(name)
+    return int(value) if value else None
+
+
+@dataclass
+class PoolSettings:
+    max_pool_size: int = 100
+    min_pool_size: int = 0
+    timeout_ms: Optional[int] = None       # per-operation timeout (timeoutMS); None = no limit
+    read_preference: str = "primary"
+    server_selection_timeout_ms: int = 30000
+    max_idle_time_ms: Optional[int] = None
+
+    @classmethod
+    def from_env(cls, prefix: str, timeout_ms: Optional[int] = None) -> "PoolSettings":
+        return cls(
+            max_pool_size=int(os.getenv(f"{prefix}MAX_POOL_SIZE", "100")),
+            min_pool_size=int(os.getenv(f"{prefix}MIN_POOL_SIZE", "0")),
+            timeout_ms=_optional_int(f"{prefix}TIMEOUT_MS") or timeout_ms,
+            read_preference=os.getenv(f"{prefix}READ_PREFERENCE", "primary"),
+            server_selection_timeout_ms=int(os.getenv("MONGO_SERVER_SELECTION_TIMEOUT_MS", "30000")),
+            max_idle_time_ms=_optional_int("MONGO_MAX_IDLE_TIME_MS"),
+        )
+
+    def client_options(self) -> dict:
+        options = {
+            "maxPoolSize": self.max_pool_size,
+            "minPoolSize": self.min_pool_size,
+            "readPreference": self.read_preference,
+            "serverSelectionTimeoutMS": self.server_selection_timeout_ms,
+        }
+        if self.timeout_ms:
+            options["timeoutMS"] = self.timeout_ms
+        if self.max_idle_time_ms:
+            options["maxIdleTimeMS"] = self.max_idle_time_ms
+        return options
+
+
+# ------------------------------------------------------------
+#  Pool metrics
+# ------------------------------------------------------------
+pool_max_size = metrics.gauge("mongo_pool_max_size", "Configured maxPoolSize per client")
+pool_open = metrics.gauge("mongo_pool_connections_open", "Open pooled connections per client and server")
+pool_in_use = metrics.gauge("mongo_pool_connections_in_use", "Checked-out connections per client and server")
+pool_waiting = metrics.gauge("mongo_pool_checkouts_waiting", "Operations waiting for a pooled connection")
+pool_checkout_failures = metrics.counter("mongo_pool_checkout_failures_total", "Failed connection checkouts by reason")
+pool_checkout_seconds = metrics.histogram(
+    "mongo_pool_checkout_seconds", "Time to check a connection out of the pool",
+    buckets=(0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0))
+
+
+class PoolStatsListener(ConnectionPoolListener):
+    """Feeds the mongo_pool_* metrics for one client."""
+
+    def __init__(self, client_name: str):
+        self.client_name = client_name
+
+    def _labels(self, event) -> dict:
+        host, port = event.address
+        return {"client": self.client_name, "address": f"{host}:{port}"}
+
+    def connection_created(self, event):
+        pool_open.inc(**self._labels(event))
+
+    def connection_closed(self, event):
+        pool_open.dec(**self._labels(event))
+
+    def connection_check_out_started(self, event):
+        pool_waiting.inc(**self._labels(event))
+
+    def connection_checked_out(self, event):
+        labels = self._labels(event)
+        pool_waiting.dec(**labels)
+        pool_in_use.inc(**labels)
+        if event.duration is not None:
+            pool_checkout_seconds.observe(event.duration, client=self.client_name)
+
+    def connection_check_out_failed(self, event):
+        pool_waiting.dec(**self._labels(event))
+        pool_checkout_failures.inc(client=self.client_name, reason=event.reason)
+
+    def connection_checked_in(self, event):
+        pool_in_use.dec(**self._labels(event))
+
+    def connection_ready(self, event):
+        pass
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        pass
+
+    def pool_closed(self, event):
+        pass
+
+
+class CommandStatsListener(CommandListener):
+    """Feeds mongo_command_seconds (and app_errors_total on failures) for one client."""
+
+    def __init__(self, client_name: str):
+        self.client_name = client_name
+
+    def started(self, event):
+        pass
+
+    def succeeded(self, event):
+        metrics.mongo_command_seconds.observe(
+            event.duration_micros / 1e6, client=self.client_name, command=event.command_name, outcome="ok"
+        )
+
+    def failed(self, event):
+        metrics.mongo_command_seconds.observe(
+            event.duration_micros / 1e6, client=self.client_name, command=event.command_name, outcome="error"
+        )
+        metrics.errors_total.inc(stage="mongo")
+
+
+# ------------------------------------------------------------
+#  Connection manager
+# ------------------------------------------------------------
+class MongoManager:
+    def __init__(self, uri: str, sync_settings: PoolSettings, async_settings: PoolSettings):
+        self.uri = uri
+        self.sync_settings = sync_settings
+        self.async_settings = async_settings
+        self._sync_client = None
+        self._async_client = None
+        self._lock = threading.Lock()
+
+    @property
+    def sync_client(self) -> MongoClient:
+        if self._sync_client is None:
+            with self._lock:
+                if self._sync_client is None:
+                    pool_max_size.set(self.sync_settings.max_pool_size, client="sync")
+                    self._sync_client = MongoClient(
+                        self.uri,
+                        event_listeners=[PoolStatsListener("sync"), CommandStatsListener("sync")],
+                        **self.sync_settings.client_options(),
+                    )
+        return self._sync_client
+
+    @property
+    def async_client(self) -> AsyncMongoClient:
+        if self._async_client is None:
+            with self._lock:
+                if self._async_client is None:
+                    pool_max_size.set(self.async_settings.max_pool_size, client="async")
+                    self._async_client = AsyncMongoClient(
+                        self.uri,
+                        event_listeners=[PoolStatsListener("async"), CommandStatsListener("async")],
+                        **self.async_settings.client_options(),
+                    )
+        return self._async_client
+
+    def open(self, sync: bool = True, use_async: bool = True):
+        """Create the clients now (lifespan startup) rather than on first use."""
+        if sync:
+            self.sync_client
+        if use_async:
+            self.async_client
+
+    async def close(self):
+        """Close both pools; later use opens fresh clients."""
+        with self._lock:
+            sync_client, self._sync_client = self._sync_client, None
+            async_client, self._async_client = self._async_client, None
+        if sync_client is not None:
+            sync_client.close()
+        if async_client is not None:
+            await async_client.close()
+
+    def collection(self, name: str, db_name: str = DB_NAME, use_async: bool = False) -> "CollectionHandle":
+        return CollectionHandle(self, db_name, name, use_async)
+
+
+class CollectionHandle:
+    """
+    Module-level stand-in for a Collection/AsyncCollection.
+
+    Services define their collections at import time; the handle resolves
+    to the manager's current client on each use, so nothing connects
+    before the lifespan opens the pools and nothing holds a closed client
+    after it.
+    """
+
+    def __init__(self, manager: MongoManager, db_name: str, name: str, use_async: bool = False):
+        self._manager = manager
+        self._db_name = db_name
+        self._name = name
+        self._use_async = use_async
+        self._resolved = (None, None)   # (client, collection)
+
+    def _collection(self):
+        client = self._manager.async_client if self._use_async else self._manager.sync_client
+        cached_client, collection = self._resolved
+        if cached_client is not client:
+            collection = client[self._db_name][self._name]
+            self._resolved = (client, collection)
+        return collection
+
+    def __getattr__(self, attr):
+        if attr.startswith("_"):
+            raise AttributeError(attr)
+        return getattr(self._collection(), attr)
+
+    def __repr__(self):
+        kind = "async" if self._use_async else "sync"
+        return f"CollectionHandle({self._db_name}.{self._name}, {kind})"
+
+
+manager = MongoManager(
+    MONGO_URI,
+    sync_settings=PoolSettings.from_env("MONGO_"),
+    async_settings=PoolSettings.from_env("CHAT_DB_", timeout_ms=5000),
+)
+
+
+def collection(name: str, db_name: str = DB_NAME) -> CollectionHandle:
+    return manager.collection(name, db_name)
+
+
+def async_collection(name: str, db_name: str = DB_NAME) -> CollectionHandle:
+    return manager.collection(name, db_name, use_async=True)
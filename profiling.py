@@ -0,0 +1,159 @@
+"""
+Opt-in per-request CPU profiling.
+
+A request to one of PROFILE_PATHS (default /price-prediction/ and
+/damage-detection/) is profiled when it carries `X-Profile: <PROFILE_TOKEN>`
+or is picked by PROFILE_SAMPLE_RATE (fraction of requests, default 0).
+The response then has an `X-Profile-Id` header, and
+
+    GET /profiles/{profile_id}?sort=cumulative&limit=50
+
+returns the pstats report. Profiles are kept in a bounded in-memory store
+(PROFILE_STORE_SIZE entries for PROFILE_TTL_SECONDS) local to the worker.
+
+The CPU-heavy stages (YOLO, report generation, the price pipeline) run in
+the threadpool, and cProfile only sees the thread it is enabled in, so
+app.py dispatches through run_in_threadpool() below, which profiles the
+call in its worker thread when the request is being profiled. Work on the
+event loop itself is not profiled: it interleaves with other requests.
+
+With neither PROFILE_TOKEN nor PROFILE_SAMPLE_RATE set the middleware is
+not installed, and run_in_threadpool() costs one context variable lookup.
+"""
+import cProfile
+import functools
+import hmac
+import io
+import os
+import pstats
+import random
+import threading
+import time
+import uuid
+from contextvars import ContextVar
+
+from fastapi.concurrency import run_in_threadpool as _run_in_threadpool
+
+import metrics
+from cache import TTLCache
+from logs import get_logger
+
+logger = get_logger(__name__)
+
+PROFILE_TOKEN = os.getenv("PROFILE_TOKEN", "")
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+PROFILE_PATHS = tuple(
+    path.strip()
+    for path in os.getenv("PROFILE_PATHS", "/price-prediction/,/damage-detection/").split(",")
+    if path.strip()
+)
+ENABLED = bool(PROFILE_TOKEN) or PROFILE_SAMPLE_RATE > 0
+
+SORT_KEYS = tuple(pstats.Stats.sort_arg_dict_default)
+
+store = TTLCache(
+    maxsize=int(os.getenv("PROFILE_STORE_SIZE", "50")),
+    ttl=int(os.getenv("PROFILE_TTL_SECONDS", "3600")),
+)
+metrics.register_cache("profiles", store)
+
+# The profile of the current request, if it is being profiled
+current_profile: ContextVar = ContextVar("current_profile", default=None)
+
+
+class RequestProfile:
+    """cProfile data collected from every threadpool call of one request."""
+
+    def __init__(self, profile_id: str, method: str, path: str):
+        self.profile_id = profile_id
+        self.method = method
+        self.path = path
+        self.status = None
+        self.wall_seconds = None
+        self.skipped_calls = 0
+        self._profiles = []
+        self._lock = threading.Lock()
+
+    def call(self, func):
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+        except ValueError:
+            # Python 3.12+ allows one active profiler per process; leave this call unprofiled
+            self.skipped_calls += 1
+            return func()
+        try:
+            return func()
+        finally:
+            profile.disable()
+            with self._lock:
+                self._profiles.append(profile)
+
+    def render(self, sort: str = "cumulative", limit: int = 50) -> str:
+        stream = io.StringIO()
+        stream.write(f"{self.method} {self.path} -> {self.status}, {self.wall_seconds:.3f}s wall\n")
+        stream.write(f"{len(self._profiles)} threadpool calls profiled")
+        if self.skipped_calls:
+            stream.write(f", {self.skipped_calls} skipped (another profiler was active)")
+        stream.write("\n\n")
+
+        if self._profiles:
+            stats = pstats.Stats(*self._profiles, stream=stream)
+            stats.sort_stats(sort).print_stats(limit)
+        return stream.getvalue()
+
+
+async def run_in_threadpool(func, *args, **kwargs):
+    """fastapi.concurrency.run_in_threadpool, profiling the call if the request is profiled."""
+    profile = current_profile.get()
+    if profile is None:
+        return await _run_in_threadpool(func, *args, **kwargs)
+    return await _run_in_threadpool(profile.call, functools.partial(func, *args, **kwargs))
+
+
+def get_profile(profile_id: str):
+    return store.get(profile_id)
+
+
+class ProfilingMiddleware:
+    """ASGI middleware that picks the requests to profile and stores their profiles."""
+
+    def __init__(self, app):
+        self.app = app
+
+    def _wanted(self, scope) -> bool:
+        if not scope["path"].startswith(PROFILE_PATHS):
+            return False
+        if PROFILE_TOKEN:
+            for name, value in scope["headers"]:
+                if name == b"x-profile" and hmac.compare_digest(value, PROFILE_TOKEN.encode()):
+                    return True
+        return random.random() < PROFILE_SAMPLE_RATE
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self._wanted(scope):
+            return await self.app(scope, receive, send)
+
+        profile = RequestProfile(uuid.uuid4().hex, scope["method"], scope["path"])
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                profile.status = message["status"]
+                headers = [*message.get("headers", []), (b"x-profile-id", profile.profile_id.encode())]
+                message = {**message, "headers": headers}
+            await send(message)
+
+        token = current_profile.set(profile)
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            profile.wall_seconds = time.perf_counter() - start
+            current_profile.reset(token)
+            store.set(profile.profile_id, profile)
+            logger.info("Request profiled", extra={
+                "profile_id": profile.profile_id,
+                "path": profile.path,
+                "status": profile.status,
+                "wall_seconds": round(profile.wall_seconds, 3),
+            })
@@ -0,0 +1,178 @@
+"""
+Deployment roles, lazy subsystem loading and a startup-time report.
+
+A worker serves the roles listed in APP_ROLES (comma separated, default all):
+
+    damage     /damage-detection/, /condition-scoring/
+    price      /price-prediction/
+    verify     /full-verification/ (damage + price)
+    recommend  /recommend/
+    chat       /chat...
+
+Endpoints of other roles are not registered, and their subsystems are
+never imported. Subsystems of enabled roles are imported on first use
+(best for serverless cold starts), or all at startup with APP_PRELOAD=1
+(best for long-lived workers).
+
+Every lazy import and startup step is timed. The report is logged at
+startup and exported as app_startup_seconds on /metrics. For a
+per-package breakdown of a plain `import app`, run:
+
+    python -m startup
+"""
+import importlib
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+import metrics
+from logs import get_logger
+
+logger = get_logger(__name__)
+
+ROLES = ("damage", "price", "verify", "recommend", "chat")
+
+APP_ROLES = {
+    role.strip()
+    for role in os.getenv("APP_ROLES", ",".join(ROLES)).split(",")
+    if role.strip()
+}
+APP_PRELOAD = os.getenv("APP_PRELOAD", "0") == "1"
+
+unknown = APP_ROLES - set(ROLES)
+if unknown:
+    raise ValueError(f"Unknown APP_ROLES {sorted(unknown)}; expected some of {ROLES}")
+
+startup_seconds = metrics.gauge(
+    "app_startup_seconds", "Import and initialization time per module or startup step")
+
+_report = {}          # (phase, name) -> seconds
+_lazy_modules = []
+_process_start = time.perf_counter()
+
+
+def role_enabled(*roles) -> bool:
+    """True if this worker serves any of the given roles."""
+    return any(role in APP_ROLES for role in roles)
+
+
+def record(phase: str, name: str, seconds: float):
+    _report[(phase, name)] = seconds
+    startup_seconds.set(round(seconds, 4), phase=phase, name=name)
+
+
+@contextmanager
+def step(name: str):
+    """Time one initialization step (lifespan startup)."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record("init", name, time.perf_counter() - start)
+
+
+class LazyModule:
+    """
+    Module imported (and timed) on first attribute access.
+
+    app.py refers to subsystems as `pricing.run_pipeline` etc., so a worker
+    that never serves a role never pays for its imports.
+    """
+
+    def __init__(self, name: str, *roles):
+        self._name = name
+        self._roles = roles
+        self._module = None
+        self._lock = threading.Lock()
+
+    @property
+    def loaded(self) -> bool:
+        return self._module is not None
+
+    @property
+    def enabled(self) -> bool:
+        return not self._roles or role_enabled(*self._roles)
+
+    def load(self):
+        if self._module is None:
+            with self._lock:
+                if self._module is None:
+                    start = time.perf_counter()
+                    module = importlib.import_module(self._name)
+                    record("import", self._name, time.perf_counter() - start)
+                    self._module = module
+        return self._module
+
+    def __getattr__(self, attr):
+        if attr.startswith("_"):
+            raise AttributeError(attr)
+        return getattr(self.load(), attr)
+
+    def __repr__(self):
+        state = "loaded" if self._module is not None else "not loaded"
+        return f"<lazy module {self._name} ({state})>"
+
+
+def lazy(name: str, *roles) -> LazyModule:
+    module = LazyModule(name, *roles)
+    _lazy_modules.append(module)
+    return module
+
+
+def preload():
+    """Import every enabled lazy module now."""
+    for module in _lazy_modules:
+        if module.enabled:
+            module.load()
+
+
+def prune_routes(app, route_roles: dict):
+    """Drop routes whose path prefix belongs only to roles this worker does not serve."""
+    def served(path: str) -> bool:
+        for prefix, roles in route_roles.items():
+            if path.startswith(prefix):
+                return role_enabled(*roles)
+        return True
+
+    app.router.routes = [route for route in app.router.routes if served(getattr(route, "path", ""))]
+
+
+def report() -> dict:
+    return {f"{phase}:{name}": round(seconds, 4) for (phase, name), seconds in _report.items()}
+
+
+def log_report():
+    total = time.perf_counter() - _process_start
+    logger.info("Startup complete", extra={
+        "roles": sorted(APP_ROLES),
+        "preload": APP_PRELOAD,
+        "ready_seconds": round(total, 3),
+        "steps": dict(sorted(report().items(), key=lambda item: -item[1])),
+    })
+
+
+if __name__ == "__main__":
+    import subprocess
+    import sys
+    from collections import defaultdict
+
+    # -X importtime prints "import time: self [us] | cumulative | package" per imported module
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import app"],
+        capture_output=True, text=True, cwd=os.path.dirname(os.path.abspath(__file__)),
+    )
+    self_us = defaultdict(int)
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        own, _, package = line[len("import time:"):].split("|")
+        if own.strip().isdigit():
+            self_us[package.strip().split(".")[0]] += int(own)
+
+    total = sum(self_us.values())
+    print(f"import app: {total / 1e6:.2f}s across {len(self_us)} top-level packages")
+    for package, us in sorted(self_us.items(), key=lambda item: -item[1])[:25]:
+        print(f"  {package:<30} {us / 1000:8.1f} ms  {us / total:6.1%}")
+    if result.returncode:
+        print(result.stderr.strip().splitlines()[-1])
@@ -0,0 +1,40 @@
+import pytest
+
+from ChatBot.answer_cache import SemanticAnswerCache
+
+
+@pytest.fixture
+def cache():
+    cache = SemanticAnswerCache(maxsize=100, threshold=0.85)
+    cache.store("Is the iPhone 13 PTA approved?", "pta answer")
+    cache.store("is galaxy s23 waterproof", "waterproof answer")
+    return cache
+
+
+@pytest.mark.parametrize("question, answer", [
+    ("is the iphone 13 pta approved", "pta answer"),
+    ("Is the iPhone 13 PTA-approved??", "pta answer"),
+    ("is galaxy s23 waterproof?", "waterproof answer"),
+])
+def test_rephrased_question_hits(cache, question, answer):
+    assert cache.lookup(question) == answer
+
+
+@pytest.mark.parametrize("question", [
+    "Is the iPhone 13 Pro PTA approved?",
+    "is the iphone 13 mini pta approved",
+    "is the iphone 14 pta approved",
+    "is galaxy s23 ultra waterproof",
+    "is galaxy s23+ waterproof",
+])
+def test_other_models_miss(cache, question):
+    assert cache.lookup(question) is None
+
+
+@pytest.mark.parametrize("question", [
+    "is galaxy s23 not waterproof",
+    "isn't the galaxy s23 waterproof",
+    "Is the iPhone 13 not PTA approved?",
+])
+def test_negated_questions_miss(cache, question):
+    assert cache.lookup(question) is None
@@ -0,0 +1,94 @@
+import threading
+import time
+
+import pytest
+
+from cache import TTLCache
+
+
+def test_get_or_compute_collapses_concurrent_calls():
+    cache = TTLCache(maxsize=10)
+    calls = []
+    started = threading.Event()
+
+    def compute():
+        calls.append(1)
+        started.set()
+        time.sleep(0.05)
+        return "value"
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cache.get_or_compute("k", compute)))
+               for _ in range(8)]
+    threads[0].start()
+    started.wait()
+    for thread in threads[1:]:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert calls == [1]
+    assert results == ["value"] * 8
+
+
+def test_failed_computation_reaches_waiters_and_is_not_cached():
+    cache = TTLCache(maxsize=10)
+    started = threading.Event()
+
+    def fail():
+        started.set()
+        time.sleep(0.05)
+        raise RuntimeError("boom")
+
+    errors = []
+
+    def call(compute):
+        try:
+            cache.get_or_compute("k", compute)
+        except RuntimeError as e:
+            errors.append(str(e))
+
+    owner = threading.Thread(target=call, args=(fail,))
+    owner.start()
+    started.wait()
+    waiter = threading.Thread(target=call, args=(lambda: "unused",))
+    waiter.start()
+    owner.join()
+    waiter.join()
+
+    assert errors == ["boom", "boom"]
+    assert cache.get_or_compute("k", lambda: "fresh") == "fresh"
+
+
+def test_entries_expire_after_ttl():
+    cache = TTLCache(maxsize=10, ttl=0.05)
+    cache.set("k", 1)
+    assert cache.get("k") == 1
+    time.sleep(0.06)
+    assert cache.get("k") is None
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = TTLCache(maxsize=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+
+    assert cache.get("b") is None
+    assert cache.get("a") == 1 and cache.get("c") == 3
+
+
+@pytest.mark.parametrize("predicate, left", [
+    (None, set()),
+    (lambda key: key[1] != "v2", {("phone", "v2")}),
+])
+def test_invalidate(predicate, left):
+    cache = TTLCache(maxsize=10)
+    for key in [("phone", "v1"), ("phone", "v2"), ("other", "v1")]:
+        cache.set(key, 1)
+
+    cache.invalidate(predicate)
+
+    assert {key for key in [("phone", "v1"), ("phone", "v2"), ("other", "v1")] if cache.get(key)} == left
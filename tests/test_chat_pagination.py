@@ -0,0 +1,116 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+from bson import ObjectId
+
+import ChatBot.crud as crud
+
+CONVERSATION_ID = ObjectId()
+
+
+def _matches(doc, query):
+    for key, condition in query.items():
+        if key == "$or":
+            if not any(_matches(doc, clause) for clause in condition):
+                return False
+        elif isinstance(condition, dict):
+            for op, value in condition.items():
+                if op == "$lt" and not doc[key] < value:
+                    return False
+                if op == "$gt" and not doc[key] > value:
+                    return False
+        elif doc.get(key) != condition:
+            return False
+    return True
+
+
+class FakeCursor:
+    def __init__(self, docs):
+        self.docs = docs
+
+    def sort(self, keys):
+        for key, order in reversed(keys):
+            self.docs.sort(key=lambda doc: doc[key], reverse=order == -1)
+        return self
+
+    def limit(self, n):
+        self.docs = self.docs[:n]
+        return self
+
+    def batch_size(self, n):
+        return self
+
+    async def __aiter__(self):
+        for doc in self.docs:
+            yield doc
+
+
+class FakeMessages:
+    """Just enough of an async collection for the history queries."""
+
+    def __init__(self, docs):
+        self.docs = docs
+        self.indexes = {}
+
+    def find(self, query, projection=None):
+        return FakeCursor([doc for doc in self.docs if _matches(doc, query)])
+
+    async def find_one(self, query, projection=None):
+        return next((doc for doc in self.docs if _matches(doc, query)), None)
+
+    async def create_index(self, keys):
+        self.indexes["_".join(f"{key}_{order}" for key, order in keys)] = keys
+
+
+@pytest.fixture
+def messages(monkeypatch):
+    start = datetime(2026, 1, 1)
+    docs = []
+    for i in range(11):
+        # Pairs of messages share a timestamp, so ties are broken by _id
+        docs.append({
+            "_id": ObjectId(), "conversation_id": CONVERSATION_ID, "role": "user" if i % 2 else "assistant",
+            "content": f"message {i}", "created_at": start + timedelta(seconds=i // 2),
+        })
+    monkeypatch.setattr(crud, "messages_col", FakeMessages(docs))
+    return docs
+
+
+def _page(**kwargs):
+    return asyncio.run(crud.get_chat_history_formatted(str(CONVERSATION_ID), **kwargs))
+
+
+def test_paging_backwards_returns_every_message_once(messages):
+    seen = []
+    page = _page(limit=3)
+    seen[:0] = [m.content for m in page.messages]
+    while page.has_more:
+        page = _page(before=page.next_cursor, limit=3)
+        seen[:0] = [m.content for m in page.messages]
+
+    assert seen == [doc["content"] for doc in messages]
+
+
+def test_paging_forwards_from_a_cursor(messages):
+    seen = []
+    page = _page(after=str(messages[0]["_id"]), limit=4)
+    seen += [m.content for m in page.messages]
+    while page.has_more:
+        page = _page(after=page.next_cursor, limit=4)
+        seen += [m.content for m in page.messages]
+
+    assert seen == [doc["content"] for doc in messages[1:]]
+
+
+def test_unknown_cursor_is_rejected(messages):
+    with pytest.raises(ValueError):
+        _page(before=str(ObjectId()))
+
+
+def test_history_index_covers_the_keyset_order(messages):
+    asyncio.run(crud.ensure_indexes())
+
+    assert crud.messages_col.indexes["conversation_id_1_created_at_1__id_1"] == [
+        ("conversation_id", 1), ("created_at", 1), ("_id", 1)
+    ]
@@ -0,0 +1,98 @@
+import pytest
+
+from models import UsedMobile
+import PricePrediction.predict_price_service as pricing
+
+
+def listing(i: int, price=None) -> UsedMobile:
+    return UsedMobile(
+        brand="Google", model="Pixel 7", ram=f"{4 + i % 3 * 2}GB", storage=f"{64 * (1 + i % 2)}GB",
+        condition=1 + i % 10, pta_approved=bool(i % 2), screen_crack=False, camera_lens_ok=True,
+        fingerprint_ok=True, price=price,
+    )
+
+
+@pytest.fixture
+def listings(monkeypatch):
+    """{listing id: UsedMobile} standing in for the live Mongo listings."""
+    live = {i: listing(i, price=40000 + 500 * i) for i in range(20)}
+
+    monkeypatch.setattr(pricing, "fetch_listing_ids", lambda model, db: set(live))
+
+    def fetch_training_records(model, db, ids=None, min_records=15):
+        wanted = live if ids is None else ids
+        return [(i, live[i]) for i in sorted(wanted) if i in live]
+
+    monkeypatch.setattr(pricing, "fetch_training_records", fetch_training_records)
+    return live
+
+
+def assert_lineage_matches(entry):
+    assert sum(batch["n_trees"] for batch in entry["batches"]) == len(entry["model"].estimators_)
+
+
+def test_new_listings_get_their_own_batch(listings):
+    previous = pricing._full_train("Pixel 7", db=None)
+    for i in range(20, 26):
+        listings[i] = listing(i, price=50000)
+
+    entry = pricing._incremental_train("Pixel 7", previous, db=None)
+
+    assert len(entry["batches"]) == 2
+    assert entry["batches"][1]["ids"] == frozenset(range(20, 26))
+    assert entry["batches"][1]["n_trees"] > 0
+    assert_lineage_matches(entry)
+
+
+def test_batch_without_prices_adds_no_trees(listings):
+    previous = pricing._full_train("Pixel 7", db=None)
+    for i in range(20, 23):
+        listings[i] = listing(i, price=None)
+
+    entry = pricing._incremental_train("Pixel 7", previous, db=None)
+
+    assert len(entry["batches"]) == 1
+    assert len(entry["model"].estimators_) == pricing.N_ESTIMATORS
+    assert_lineage_matches(entry)
+
+
+def test_retiring_an_expired_batch_keeps_live_trees(listings):
+    previous = pricing._full_train("Pixel 7", db=None)
+    for i in range(20, 26):
+        listings[i] = listing(i, price=50000)
+    previous = pricing._incremental_train("Pixel 7", previous, db=None)
+    full_trees = previous["model"].estimators_[:pricing.N_ESTIMATORS]
+
+    # The incremental batch expires, and a listing without a price arrives
+    for i in range(20, 26):
+        del listings[i]
+    listings[30] = listing(30, price=None)
+
+    entry = pricing._incremental_train("Pixel 7", previous, db=None)
+
+    assert [batch["kind"] for batch in entry["batches"]] == ["full"]
+    assert entry["model"].estimators_ == full_trees
+    assert_lineage_matches(entry)
+
+    # A later retirement still indexes the right trees
+    listings[31] = listing(31, price=52000)
+    later = pricing._incremental_train("Pixel 7", entry, db=None)
+    assert later["model"].estimators_[:pricing.N_ESTIMATORS] == full_trees
+    assert_lineage_matches(later)
+
+
+def test_new_versions_log_their_lineage(listings, monkeypatch, caplog):
+    monkeypatch.setattr(pricing, "model_registry", pricing.TTLCache(maxsize=8))
+    monkeypatch.setattr(pricing, "fresh_models", pricing.TTLCache(maxsize=8))
+    caplog.set_level("INFO", logger=pricing.logger.name)
+
+    pricing.get_price_model("Pixel 7", db=None)
+    for i in range(20, 26):
+        listings[i] = listing(i, price=50000)
+    pricing.fresh_models.invalidate()
+    entry = pricing.get_price_model("Pixel 7", db=None)
+
+    updates = [r for r in caplog.records if r.getMessage() == "Price model updated"]
+    assert [r.version for r in updates][-1] == entry["version"]
+    assert [batch["kind"] for batch in updates[-1].lineage] == ["full", "incremental"]
+    assert updates[-1].lineage == pricing.model_lineage("Pixel 7")
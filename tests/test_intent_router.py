@@ -0,0 +1,53 @@
+import json
+import os
+
+import pytest
+
+from ChatBot.intent_router import route
+
+CORPUS_PATH = os.path.join(os.path.dirname(__file__), "..", "ChatBot", "intent_corpus.jsonl")
+
+with open(CORPUS_PATH) as f:
+    CORPUS = [json.loads(line) for line in f if line.strip()]
+
+
+@pytest.mark.parametrize("case", CORPUS, ids=[case["message"] for case in CORPUS])
+def test_corpus(case):
+    result = route(case["message"])
+    got = {"intent": result.intent, "budget": result.budget, "priority": result.priority}
+    expected = {key: case[key] for key in got if key in case}
+    assert {key: got[key] for key in expected} == expected
+
+
+@pytest.mark.parametrize("message", [
+    "How much RAM does the Pixel 8 have?",
+    "how much does a battery replacement for iPhone 13 cost",
+    "what is the cost of repairing iPhone 12 screen",
+    "what is the refresh rate of the pixel 8",
+])
+def test_spec_and_service_questions_are_not_price_checks(message):
+    assert route(message).intent != "price_check"
+
+
+@pytest.mark.parametrize("message, subject", [
+    ("What is the price of Samsung Galaxy A54?", "samsung galaxy a54"),
+    ("how much does the iphone 15 cost?", "the iphone 15"),
+    ("Redmi Note 13 kitne ka hai", "redmi note 13"),
+])
+def test_price_check_subject(message, subject):
+    result = route(message)
+    assert result.intent == "price_check"
+    assert result.subject == subject
+
+
+def test_price_check_reply_falls_through_when_more_than_the_phone_is_asked(monkeypatch):
+    chatbot = pytest.importorskip("ChatBot.chatbot")
+    from RecommendationEngine.phone_catalog import CatalogSnapshot
+
+    snapshot = CatalogSnapshot([{"_id": 1, "phone_name": "Google Pixel 8", "price_range": 150000.0}])
+    monkeypatch.setattr(chatbot.catalog, "_snapshot", snapshot)
+
+    assert "Rs" in chatbot.price_check_reply("price of pixel 8 in pakistan", "pixel 8 in pakistan")
+    assert chatbot.price_check_reply("price of pixel 8 128gb", "pixel 8 128gb") is not None
+    assert chatbot.price_check_reply("price of pixel 8 vs iphone", "pixel 8 vs iphone") is None
+    assert chatbot.price_check_reply("price of nokia 3310", "nokia 3310") is None
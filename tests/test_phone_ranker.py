@@ -0,0 +1,10 @@
+from RecommendationEngine.phone_ranker import FEATURES, parse_features
+
+CHIPSET_TIER = FEATURES.index("chipset_tier")
+
+
+def test_chipset_falls_back_to_the_description():
+    described = parse_features({"description": "Powered by the Snapdragon 8 Gen 2 with 12GB RAM"})
+    listed = parse_features({"chipset": "Snapdragon 8 Gen 2"})
+
+    assert described[CHIPSET_TIER] == listed[CHIPSET_TIER] > 0
@@ -0,0 +1,57 @@
+import pytest
+
+from models import UsedMobile
+import PricePrediction.predict_price_service as pricing
+
+MODEL = "Pixel 7A"
+
+
+class FakeTables:
+    def __init__(self, table):
+        self.table = table
+
+    def find_one(self, query):
+        return self.table if query["_id"] == self.table["_id"] else None
+
+
+@pytest.fixture
+def table_db(monkeypatch):
+    monkeypatch.setattr(pricing, "price_tables", pricing.TTLCache(maxsize=10))
+    monkeypatch.setattr(pricing, "model_registry", pricing.TTLCache(maxsize=10))
+    return FakeTables({
+        "_id": pricing._model_key(MODEL),
+        "version": "v1",
+        "step": 1.0,
+        "template": pricing._template_features(),
+        "prices": {pricing.price_table_slot(8, 128): [10000 + 1000 * i for i in range(21)]},
+    })
+
+
+def input_df(score, **overrides):
+    mobile = UsedMobile(**{**pricing.PRICE_TABLE_TEMPLATE, **overrides},
+                        brand="Google", model=MODEL, ram="8GB", storage="128GB", condition_score=score)
+    return pricing.preprocess_input_mobile(mobile)
+
+
+@pytest.mark.parametrize("score, price", [(0, 10000), (12, 22000), (12.5, 22500), (12.25, 22250), (20, 30000)])
+def test_scores_between_grid_points_are_interpolated(table_db, score, price):
+    assert pricing.lookup_base_price(MODEL, input_df(score), table_db) == pytest.approx(price)
+
+
+@pytest.mark.parametrize("score", [-1, 20.5])
+def test_scores_outside_the_grid_use_live_inference(table_db, score):
+    assert pricing.lookup_base_price(MODEL, input_df(score), table_db) is None
+
+
+def test_inputs_off_the_template_use_live_inference(table_db):
+    assert pricing.lookup_base_price(MODEL, input_df(10, screen_crack=True), table_db) is None
+
+
+def test_table_from_another_forest_is_skipped(table_db):
+    key = pricing._model_key(MODEL)
+
+    pricing.model_registry.set(key, {"version": "v2"})
+    assert pricing.lookup_base_price(MODEL, input_df(10), table_db) is None
+
+    pricing.model_registry.set(key, {"version": "v1"})
+    assert pricing.lookup_base_price(MODEL, input_df(10), table_db) == 20000
@@ -0,0 +1,49 @@
+import asyncio
+import io
+
+import pytest
+from fastapi import HTTPException
+from fastapi.testclient import TestClient
+from starlette.datastructures import UploadFile
+
+import app
+
+
+def test_oversized_upload_is_rejected_with_413(monkeypatch):
+    monkeypatch.setattr(app, "UPLOAD_MAX_BYTES", 1024)
+    client = TestClient(app.app)
+
+    response = client.post(
+        "/damage-detection/upload",
+        files={"front": ("front.jpg", b"x" * 2048, "image/jpeg")},
+    )
+
+    assert response.status_code == 413
+    assert "front" in response.json()["detail"]
+
+
+@pytest.mark.parametrize("size", [None, 2048])
+def test_read_upload_stops_at_the_limit(monkeypatch, size):
+    monkeypatch.setattr(app, "UPLOAD_MAX_BYTES", 1024)
+    monkeypatch.setattr(app, "UPLOAD_CHUNK_BYTES", 256)
+    upload = UploadFile(file=io.BytesIO(b"x" * 2048), size=size)
+
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(app.read_upload("back", upload))
+
+    assert error.value.status_code == 413
+    # An undeclared size is read in chunks only until the limit is passed
+    assert upload.file.tell() <= 1024 + 256
+
+
+def test_upload_within_the_limit_is_read_whole(monkeypatch):
+    monkeypatch.setattr(app, "UPLOAD_MAX_BYTES", 1024)
+    upload = UploadFile(file=io.BytesIO(b"x" * 1000))
+
+    assert asyncio.run(app.read_upload("back", upload)) == b"x" * 1000
+
+
+def test_missing_images_are_rejected():
+    response = TestClient(app.app).post("/damage-detection/upload")
+
+    assert response.status_code == 400
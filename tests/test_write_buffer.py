@@ -0,0 +1,92 @@
+import asyncio
+
+from bson import ObjectId
+from pymongo.errors import BulkWriteError
+
+from ChatBot.write_buffer import DUPLICATE_KEY, TurnWriteBuffer
+
+CONVERSATION_ID = ObjectId()
+
+
+def turn(n):
+    return [
+        {"_id": ObjectId(), "conversation_id": CONVERSATION_ID, "role": role, "content": f"{role} {n}",
+         "created_at": n}
+        for role in ("user", "assistant")
+    ]
+
+
+class FakeConversations:
+    def __init__(self):
+        self.updates = []
+
+    async def bulk_write(self, requests, ordered=True):
+        self.updates += requests
+
+
+class FakeMessages:
+    def __init__(self, fail_indices=(), duplicate_indices=()):
+        self.saved = []
+        self.fail_indices = set(fail_indices)
+        self.duplicate_indices = set(duplicate_indices)
+        self.during_insert = None
+
+    async def insert_many(self, docs, ordered=True):
+        if self.during_insert is not None:
+            self.during_insert()
+        errors = []
+        for i, doc in enumerate(docs):
+            if i in self.fail_indices:
+                errors.append({"index": i, "code": 121, "errmsg": "validation failed"})
+            elif i in self.duplicate_indices:
+                errors.append({"index": i, "code": DUPLICATE_KEY, "errmsg": "duplicate key"})
+            else:
+                self.saved.append(doc)
+        if errors:
+            raise BulkWriteError({"writeErrors": errors, "writeConcernErrors": [], "nInserted": len(docs) - len(errors)})
+
+
+def test_turns_being_flushed_stay_visible():
+    messages = FakeMessages()
+    buffer = TurnWriteBuffer(messages, FakeConversations())
+    buffer.add(turn(1))
+
+    seen = []
+    messages.during_insert = lambda: seen.extend(m["content"] for m in buffer.pending(CONVERSATION_ID))
+    asyncio.run(buffer.flush())
+
+    assert seen == ["user 1", "assistant 1"]
+    assert buffer.pending(CONVERSATION_ID) == []
+
+
+def test_partial_failure_requeues_only_unwritten_messages():
+    messages = FakeMessages(fail_indices={3})
+    buffer = TurnWriteBuffer(messages, FakeConversations())
+    buffer.add(turn(1))
+    buffer.add(turn(2))
+
+    try:
+        asyncio.run(buffer.flush())
+    except BulkWriteError:
+        pass
+    else:
+        raise AssertionError("flush should report the failed write")
+
+    assert [m["content"] for m in messages.saved] == ["user 1", "assistant 1", "user 2"]
+    assert [m["content"] for m in buffer.pending(CONVERSATION_ID)] == ["assistant 2"]
+
+    messages.fail_indices.clear()
+    asyncio.run(buffer.flush())
+    assert [m["content"] for m in messages.saved][-1] == "assistant 2"
+    assert buffer.pending(CONVERSATION_ID) == []
+
+
+def test_duplicates_from_an_earlier_attempt_count_as_written():
+    conversations = FakeConversations()
+    buffer = TurnWriteBuffer(FakeMessages(duplicate_indices={0, 1}), conversations)
+    buffer.add(turn(1))
+
+    asyncio.run(buffer.flush())
+
+    assert buffer.pending(CONVERSATION_ID) == []
+    assert len(conversations.updates) == 1